@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Bill, BillItem
+from django.db import transaction
+from .models import Bill, BillItem, DailyCategorySales, DailySales, IdempotencyKey, InvoiceDelivery
+from .pdf_cache import invalidate as invalidate_pdf
+from .rollups import record_bill
 
 
 class BillItemInline(admin.TabularInline):
@@ -14,8 +17,81 @@ class BillAdmin(admin.ModelAdmin):
     search_fields = ['bill_number', 'customer_name', 'customer_phone']
     inlines = [BillItemInline]
 
+    # Bills changed here leave the daily sales rollups as they were and go
+    # back in as they are now, like the API's create and delete
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            previous = Bill.objects.get(pk=obj.pk)
+            record_bill(previous, previous.items.select_related('item'), sign=-1)
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # The lines may have changed, so the totals are worked out again
+        bill = form.instance
+        bill_items = list(bill.items.select_related('item'))
+        bill.calculate_totals(bill_items)
+        record_bill(bill, bill_items)
+        invalidate_pdf(bill.pk)
+
+    def get_deleted_objects(self, objs, request):
+        # A bill's lines go with it, although they cannot be deleted on their own
+        deleted, model_count, perms_needed, protected = super().get_deleted_objects(objs, request)
+        perms_needed.discard(BillItem._meta.verbose_name)
+        return deleted, model_count, perms_needed, protected
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            record_bill(obj, obj.items.select_related('item'), sign=-1)
+            invalidate_pdf(obj.pk)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for bill in queryset.prefetch_related('items__item'):
+                record_bill(bill, bill.items.all(), sign=-1)
+                invalidate_pdf(bill.pk)
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(BillItem)
 class BillItemAdmin(admin.ModelAdmin):
+    """Lines are edited on their bill, which keeps its totals and the rollups in step"""
     list_display = ['bill', 'item', 'quantity', 'unit_price', 'subtotal']
     list_filter = ['bill__created_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ['day', 'bill_count', 'units_sold', 'total_amount', 'final_amount']
+    date_hierarchy = 'day'
+
+
+@admin.register(DailyCategorySales)
+class DailyCategorySalesAdmin(admin.ModelAdmin):
+    list_display = ['day', 'category', 'bill_count', 'units_sold', 'total_amount']
+    list_filter = ['category']
+    date_hierarchy = 'day'
+
+
+@admin.register(InvoiceDelivery)
+class InvoiceDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['bill', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['bill__bill_number', 'bill__customer_email']
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'user', 'status_code', 'created_at', 'expires_at']
+    search_fields = ['key']
@@ -0,0 +1,72 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from clothshop.async_api import async_api_view, iterate_in_thread, json_response
+from inventory.models import ClothItem
+from .bulk_pdfs import render_pool, stream_zip
+from .exports import EXPORT_FORMATS, stream_bills
+from .models import Bill, DailySales
+from .pdf_cache import get_bill_pdf, get_cached_bill_pdf
+from .views import (
+    BILL_TOTALS, INVENTORY_TOTALS, BillViewSet, bill_pdf_response, streaming_attachment,
+    summary_data
+)
+
+
+# Async versions of the dashboard summary and the PDF / export downloads,
+# routed by clothshop.asgi_urls. PDFs are rendered in the render_pool()
+# processes and streams are advanced on their own thread, so a slow invoice
+# does not hold up other requests.
+
+
+@async_api_view
+async def summary(request):
+    """Shop-wide dashboard totals (GET /api/billing/summary/)"""
+    inventory_totals = await ClothItem.objects.aaggregate(**INVENTORY_TOTALS)
+    bill_totals = await DailySales.objects.aaggregate(**BILL_TOTALS)
+    return json_response(summary_data(inventory_totals, bill_totals))
+
+
+@async_api_view
+async def download_pdf(request, pk):
+    """Invoice PDF for a bill; rendered in the render pool on a cache miss"""
+    view = BillViewSet(request=request, action='download_pdf', format_kwarg=None)
+    try:
+        bill = await view.get_queryset().aget(pk=pk)
+    except Bill.DoesNotExist:
+        return json_response({'detail': 'Not found.'}, status=404)
+
+    pdf = await sync_to_async(get_cached_bill_pdf, thread_sensitive=False)(bill)
+    if pdf is None:
+        # The bill travels with its lines prefetched; the render process never queries
+        pdf = await asyncio.get_running_loop().run_in_executor(render_pool(), get_bill_pdf, bill)
+    return bill_pdf_response(request, bill, *pdf)
+
+
+@async_api_view
+async def export(request):
+    """Bill lines as CSV or NDJSON (?export_format=csv|ndjson), streamed"""
+    export_format = request.query_params.get('export_format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return json_response(
+            {'error': f'export_format must be one of: {", ".join(EXPORT_FORMATS)}'},
+            status=400
+        )
+
+    view = BillViewSet(request=request, action='export', format_kwarg=None)
+    return streaming_attachment(
+        iterate_in_thread(stream_bills(view.get_queryset(), export_format)),
+        EXPORT_FORMATS[export_format],
+        f'bills.{export_format}'
+    )
+
+
+@async_api_view
+async def pdf_archive(request):
+    """ZIP of the PDFs of every matching bill, streamed as they are rendered"""
+    view = BillViewSet(request=request, action='pdf_archive', format_kwarg=None)
+    bills = view.get_queryset().order_by('created_at', 'id')
+    archive = stream_zip(bills, settings.PDF_RENDER_WORKERS, render_pool())
+    return streaming_attachment(iterate_in_thread(archive), 'application/zip', 'bills.zip')
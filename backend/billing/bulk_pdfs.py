@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+
+from .pdf_cache import get_bill_pdf
+
+
+# Bills handed to a worker per task; large enough to amortise pickling,
+# small enough to keep every core busy near the end of the run
+CHUNK_SIZE = 8
+
+# Tasks queued ahead per worker, bounds memory when exporting many bills
+TASKS_PER_WORKER = 2
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def pdf_filename(bill):
+    return f'bill_{bill.bill_number}.pdf'
+
+
+def render_bills(bills):
+    """
+    Render (or fetch from the PDF cache) a chunk of bills.
+
+    Runs inside a worker process. The bills arrive with their lines
+    prefetched, so no database access happens here.
+
+    Returns:
+        list: (filename, pdf bytes) pairs
+    """
+    return [(pdf_filename(bill), get_bill_pdf(bill)[0]) for bill in bills]
+
+
+def _init_worker():
+    # Spawned workers (render_pool, macOS / Windows) start without Django configured
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def render_pool():
+    """
+    Long-lived process pool for rendering PDFs outside the web process.
+
+    Shared by all requests of a web worker, so concurrent archive downloads
+    queue for the same PDF_RENDER_WORKERS processes instead of starting
+    their own. ReportLab holds the GIL while it renders, so rendering on a
+    thread would stall the other threads (and the event loop under ASGI).
+    Started on first use; the processes are spawned rather than forked
+    because the web process already has threads running.
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'PDF_RENDER_WORKERS', 1),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+        return _render_pool
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_bill_pdfs(bills, workers=None, pool=None):
+    """
+    Yield (filename, pdf bytes) for every bill, in queryset order.
+
+    Bills are read in chunks with their lines prefetched and rendered
+    across a process pool. Only a few chunks per worker are in flight at a
+    time, so memory stays flat however many bills match.
+
+    Args:
+        bills: Bill queryset
+        workers: number of rendering processes (defaults to the CPU count);
+                 with a pool, how many of its processes to keep busy
+        pool: existing executor to render on; web requests must pass
+              render_pool(). It is left running afterwards
+    """
+    workers = workers or default_workers()
+    rows = bills.with_items().iterator(chunk_size=CHUNK_SIZE * workers * TASKS_PER_WORKER)
+    chunks = _chunks(rows, CHUNK_SIZE)
+
+    if pool is None and workers == 1:
+        for chunk in chunks:
+            yield from render_bills(chunk)
+        return
+
+    own_pool = pool is None
+    if own_pool:
+        # Only the export command gets here; its process has no other threads to fork
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append(pool.submit(render_bills, chunk))
+            if len(pending) >= workers * TASKS_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # Also runs when a streaming client disconnects mid-download
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
+        else:
+            for future in pending:
+                future.cancel()
+
+
+class _ZipStream:
+    """Write-only file object that hands back what zipfile wrote so far"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def write_zip(fileobj, bills, workers=None):
+    """
+    Write the PDFs for `bills` into a ZIP archive.
+
+    Returns:
+        int: number of PDFs written
+    """
+    count = 0
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_STORED) as archive:
+        for filename, pdf_content in iter_bill_pdfs(bills, workers):
+            archive.writestr(filename, pdf_content)
+            count += 1
+    return count
+
+
+def stream_zip(bills, workers=None, pool=None):
+    """
+    Yield a ZIP archive of the PDFs for `bills` piece by piece.
+
+    PDFs are already compressed, so entries are stored rather than
+    deflated and each one is sent as soon as it has been rendered.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as archive:
+        for filename, pdf_content in iter_bill_pdfs(bills, workers, pool):
+            archive.writestr(filename, pdf_content)
+            yield stream.pop()
+    yield stream.pop()
@@ -0,0 +1,121 @@
+from functools import cache
+
+from django.db.models import Prefetch, prefetch_related_objects
+from rest_framework import status
+
+from .models import Bill, BillItem
+from .rollups import record_bill
+from .deliveries import enqueue_invoice
+from .numbering import next_bill_number
+from inventory.models import ClothItem
+from inventory.reservations import InsufficientStock, reserve_stock
+
+
+class CheckoutError(Exception):
+    """
+    Raised when a bill cannot be created; carries the HTTP status to return
+    and a short code ('invalid', 'not_found' or 'insufficient_stock')
+    """
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST, code='invalid'):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.code = code
+
+
+def create_bill(data):
+    """
+    Create a bill and its items with a fixed number of queries.
+
+    All requested items are fetched in one query, every line is validated
+    in memory, stock is taken through inventory.reservations.reserve_stock
+    (one locking SELECT plus one UPDATE), the bill is numbered, the bill
+    items are inserted with bulk_create, the daily sales rollups are
+    updated and the invoice email is queued. Must be called inside a
+    transaction; any CheckoutError leaves the caller to roll back.
+
+    Args:
+        data: validated data from CreateBillSerializer
+
+    Returns:
+        Bill: the saved bill with items (and their stock) prefetched
+    """
+    lines = []
+    for item_data in data['items']:
+        try:
+            item_id = int(item_data['item_id'])
+        except (TypeError, ValueError):
+            raise CheckoutError(f'Invalid item id {item_data["item_id"]}')
+        try:
+            quantity = int(item_data['quantity'])
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity < 1:
+            raise CheckoutError(f'Invalid quantity for item {item_id}')
+        lines.append((item_id, quantity))
+
+    items = ClothItem.objects.in_bulk(
+        {item_id for item_id, _ in lines}
+    )
+
+    # Validate every line and total up the quantity requested per item
+    requested = {}
+    for item_id, quantity in lines:
+        cloth_item = items.get(item_id)
+        if cloth_item is None:
+            raise CheckoutError(
+                f'Item with id {item_id} not found',
+                status.HTTP_404_NOT_FOUND,
+                code='not_found'
+            )
+        requested[item_id] = requested.get(item_id, 0) + quantity
+
+    # Numbered once the stock is secured, so a refused bill does not use up a number
+    take_number = cache(next_bill_number)
+    try:
+        reserve_stock(requested, reference=take_number)
+    except InsufficientStock as e:
+        raise CheckoutError(
+            f'Insufficient stock for {items[e.item_id].name}. '
+            f'Available: {e.available}, Requested: {e.requested}',
+            code='insufficient_stock'
+        )
+
+    bill = Bill(
+        bill_number=take_number(),
+        customer_name=data['customer_name'],
+        customer_phone=data.get('customer_phone', ''),
+        customer_email=data.get('customer_email', ''),
+        discount=data.get('discount', 0),
+        tax_rate=data.get('tax_rate', 0),
+        notes=data.get('notes', '')
+    )
+
+    # bulk_create skips BillItem.save(), so the subtotal is filled in here
+    bill_items = []
+    for item_id, quantity in lines:
+        cloth_item = items[item_id]
+        bill_items.append(BillItem(
+            item=cloth_item,
+            quantity=quantity,
+            unit_price=cloth_item.price,
+            subtotal=quantity * cloth_item.price
+        ))
+
+    bill.calculate_totals(bill_items)
+    for bill_item in bill_items:
+        bill_item.bill = bill
+    BillItem.objects.bulk_create(bill_items)
+    record_bill(bill, bill_items)
+
+    if bill.customer_email:
+        enqueue_invoice(bill)
+
+    prefetch_related_objects(
+        [bill],
+        Prefetch('items', queryset=BillItem.objects.select_related('item__stock')),
+        'deliveries'
+    )
+    return bill
+
@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DeliveryStatus, InvoiceDelivery
+
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30
+STALE_AFTER = timedelta(minutes=10)
+
+
+def enqueue_invoice(bill):
+    """
+    Queue the invoice email for a bill.
+
+    Call inside the bill's transaction: the job only becomes visible to
+    workers once the bill itself is committed.
+    """
+    return InvoiceDelivery.objects.create(bill=bill, next_attempt_at=timezone.now())
+
+
+def claim_jobs(limit):
+    """
+    Claim up to `limit` due jobs for this worker.
+
+    Rows are locked with SKIP LOCKED so several workers can poll the same
+    table without handing out a job twice. Jobs left in SENDING by a worker
+    that died are picked up again once they are STALE_AFTER old.
+
+    Returns:
+        list: InvoiceDelivery rows now marked SENDING, with their bill loaded
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            # Only the job rows are locked, not the bills joined in
+            InvoiceDelivery.objects.select_related('bill')
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(
+                Q(status=DeliveryStatus.PENDING, next_attempt_at__lte=now) |
+                Q(status=DeliveryStatus.SENDING, locked_at__lt=now - STALE_AFTER)
+            )
+            .order_by('next_attempt_at')[:limit]
+        )
+        InvoiceDelivery.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=DeliveryStatus.SENDING,
+            locked_at=now
+        )
+    return jobs
+
+
+def render_job(job):
+    """
+    Render the PDF for one job.
+
+    Returns:
+        tuple: (job, pdf bytes or None, error message or None)
+    """
+    from .pdf_cache import get_bill_pdf
+
+    close_old_connections()
+    try:
+        pdf_content, _, _ = get_bill_pdf(job.bill)
+        return job, pdf_content, None
+    except Exception as e:
+        return job, None, str(e)
+    finally:
+        close_old_connections()
+
+
+def process_jobs(jobs, map_fn=map):
+    """
+    Render a batch of claimed jobs and send them over one SMTP connection.
+
+    Args:
+        jobs: InvoiceDelivery rows returned by claim_jobs
+        map_fn: map implementation used for rendering (e.g. a thread pool's map)
+
+    Returns:
+        tuple: (sent count, failed count)
+    """
+    from .email_utils import send_bill_emails
+
+    ready = []
+    failed = 0
+    for job, pdf_content, error in map_fn(render_job, jobs):
+        if error is None:
+            ready.append((job, pdf_content))
+        else:
+            record_failure(job, error)
+            failed += 1
+
+    results = send_bill_emails([(job.bill, pdf_content) for job, pdf_content in ready])
+
+    sent = 0
+    for (job, _), (_, error) in zip(ready, results):
+        if error is None:
+            record_success(job)
+            sent += 1
+        else:
+            record_failure(job, error)
+            failed += 1
+
+    return sent, failed
+
+
+def record_success(job):
+    InvoiceDelivery.objects.filter(pk=job.pk).update(
+        status=DeliveryStatus.SENT,
+        attempts=job.attempts + 1,
+        sent_at=timezone.now(),
+        locked_at=None,
+        last_error=''
+    )
+
+
+def record_failure(job, error):
+    """Retry with exponential backoff until MAX_ATTEMPTS, then give up"""
+    attempts = job.attempts + 1
+    if attempts >= MAX_ATTEMPTS:
+        status = DeliveryStatus.FAILED
+        next_attempt_at = job.next_attempt_at
+    else:
+        status = DeliveryStatus.PENDING
+        next_attempt_at = timezone.now() + timedelta(seconds=BACKOFF_SECONDS * 2 ** (attempts - 1))
+
+    InvoiceDelivery.objects.filter(pk=job.pk).update(
+        status=status,
+        attempts=attempts,
+        next_attempt_at=next_attempt_at,
+        locked_at=None,
+        last_error=error
+    )
@@ -1,22 +1,24 @@
-from django.core.mail import EmailMessage
+import time
+
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
 
 
-def send_bill_email(bill, pdf_content):
+def build_bill_email(bill, pdf_content, connection=None):
     """
-    Send bill PDF to customer via email
-    
+    Build the invoice email for a bill
+
     Args:
         bill: Bill object
         pdf_content: PDF file content as bytes
-        
+        connection: optional open mail connection to send through
+
     Returns:
-        bool: True if email sent successfully, False otherwise
+        EmailMessage: message with the PDF attached
     """
-    try:
-        subject = f'Invoice #{bill.bill_number} - Cloth Shop'
-        
-        body = f"""
+    subject = f'Invoice #{bill.bill_number} - Cloth Shop'
+
+    body = f"""
 Dear {bill.customer_name},
 
 Thank you for your purchase!
@@ -32,24 +34,67 @@ If you have any questions, please feel free to contact us.
 Best regards,
 Cloth Shop Team
         """
-        
-        email = EmailMessage(
-            subject=subject,
-            body=body,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[bill.customer_email],
-        )
-        
-        # Attach PDF
-        email.attach(
-            filename=f'invoice_{bill.bill_number}.pdf',
-            content=pdf_content,
-            mimetype='application/pdf'
-        )
-        
-        email.send(fail_silently=False)
-        return True
-        
+
+    email = EmailMessage(
+        subject=subject,
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[bill.customer_email],
+        connection=connection,
+    )
+
+    # Attach PDF
+    email.attach(
+        filename=f'invoice_{bill.bill_number}.pdf',
+        content=pdf_content,
+        mimetype='application/pdf'
+    )
+
+    return email
+
+
+def send_bill_emails(invoices, max_per_second=None):
+    """
+    Send many invoices over a single SMTP connection
+
+    The connection (and its TLS handshake) is opened once for the whole
+    batch. If a send fails the connection is reopened before the next
+    message, since the server may have dropped it.
+
+    Args:
+        invoices: list of (bill, pdf_content) pairs
+        max_per_second: optional cap on the send rate, defaults to
+                        settings.EMAIL_MAX_PER_SECOND (0 means no cap)
+
+    Returns:
+        list: one (bill, error) pair per invoice, error is None on success
+    """
+    if max_per_second is None:
+        max_per_second = getattr(settings, 'EMAIL_MAX_PER_SECOND', 0)
+    min_interval = 1.0 / max_per_second if max_per_second else 0
+
+    try:
+        connection = get_connection(fail_silently=False)
     except Exception as e:
-        print(f"Error sending email: {str(e)}")
-        return False
+        return [(bill, str(e)) for bill, _ in invoices]
+
+    results = []
+    last_sent = 0
+    try:
+        for bill, pdf_content in invoices:
+            wait = last_sent + min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            last_sent = time.monotonic()
+
+            try:
+                connection.open()
+                sent = connection.send_messages([build_bill_email(bill, pdf_content)])
+                results.append((bill, None if sent else 'Message was not sent'))
+            except Exception as e:
+                results.append((bill, str(e)))
+                connection.close()
+    finally:
+        connection.close()
+
+    return results
@@ -0,0 +1,76 @@
+import csv
+import json
+
+from .models import BillItem
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_COLUMNS = [
+    ('bill_number', 'bill__bill_number'),
+    ('created_at', 'bill__created_at'),
+    ('customer_name', 'bill__customer_name'),
+    ('customer_phone', 'bill__customer_phone'),
+    ('customer_email', 'bill__customer_email'),
+    ('discount', 'bill__discount'),
+    ('tax_rate', 'bill__tax_rate'),
+    ('bill_total', 'bill__total_amount'),
+    ('bill_final', 'bill__final_amount'),
+    ('sku', 'item__sku'),
+    ('item_name', 'item__name'),
+    ('category', 'item__category'),
+    ('size', 'item__size'),
+    ('color', 'item__color'),
+    ('quantity', 'quantity'),
+    ('unit_price', 'unit_price'),
+    ('subtotal', 'subtotal'),
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() hands the line straight back to csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(bills):
+    """
+    Iterate over one tuple per bill line for the given bill queryset.
+
+    Rows are read with .iterator() (a server-side cursor on PostgreSQL), so
+    memory use does not grow with the size of the export.
+    """
+    return (
+        BillItem.objects.filter(bill__in=bills.order_by().values('id'))
+        .order_by('bill__created_at', 'bill_id', 'id')
+        .values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def stream_csv(bills):
+    """Yield CSV lines, header first"""
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in export_rows(bills):
+        yield writer.writerow(row)
+
+
+def stream_ndjson(bills):
+    """Yield one JSON object per line"""
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for row in export_rows(bills):
+        yield json.dumps(dict(zip(names, row)), default=str) + '\n'
+
+
+def stream_bills(bills, export_format):
+    """Return the line generator for csv or ndjson"""
+    if export_format == 'ndjson':
+        return stream_ndjson(bills)
+    return stream_csv(bills)
@@ -0,0 +1,119 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    """Raised when a key cannot be used for this request; carries the HTTP status to return"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def key_ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def request_hash(data):
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def find_completed(user, key, fingerprint):
+    """
+    Return the stored result for a key that has already been used, if any.
+
+    Raises:
+        IdempotencyError: if the key was used for a different request
+    """
+    record = (
+        IdempotencyKey.objects
+        .filter(user=user, key=key, expires_at__gt=timezone.now(), status_code__isnull=False)
+        .first()
+    )
+    if record is not None and record.request_hash != fingerprint:
+        raise IdempotencyError(
+            'Idempotency-Key was already used for a different request',
+            status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return record
+
+
+def claim(user, key, fingerprint):
+    """
+    Insert the key row in the current transaction before doing the work.
+
+    A concurrent request with the same key blocks on the unique constraint
+    until the first one commits (or rolls back, in which case it takes
+    over), so exactly one of them does the work.
+
+    Returns:
+        IdempotencyKey: a new row (status_code None) for the caller to
+                        complete, or the completed row of an earlier request
+
+    Raises:
+        IdempotencyError: key in use by a request still running, or used
+                          for a different request
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(
+            f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters',
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    now = timezone.now()
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=user, key=key, request_hash=fingerprint, expires_at=now + key_ttl()
+                )
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if existing is None:
+                continue
+            if existing.expires_at <= now:
+                existing.delete()
+                continue
+            if existing.request_hash != fingerprint:
+                raise IdempotencyError(
+                    'Idempotency-Key was already used for a different request',
+                    status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if existing.status_code is None:
+                raise IdempotencyError(
+                    'A request with this Idempotency-Key is still being processed',
+                    status.HTTP_409_CONFLICT
+                )
+            return existing
+
+    raise IdempotencyError(
+        'A request with this Idempotency-Key is still being processed',
+        status.HTTP_409_CONFLICT
+    )
+
+
+def complete(record, status_code, data):
+    """Store the response so retries with the same key replay it"""
+    record.status_code = status_code
+    record.response_body = data
+    record.save(update_fields=['status_code', 'response_body'])
+
+
+def purge_expired():
+    """Delete expired keys; returns the number removed"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
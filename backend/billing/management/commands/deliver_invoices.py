@@ -0,0 +1,40 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from billing.deliveries import claim_jobs, process_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run the invoice delivery worker (renders bill PDFs and emails them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Size of the PDF rendering thread pool')
+        parser.add_argument('--batch-size', type=int, default=20, help='Invoices sent per SMTP connection')
+        parser.add_argument('--poll-interval', type=float, default=5, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+
+        self.stdout.write(self.style.SUCCESS(f'Invoice delivery worker started ({workers} threads)'))
+
+        sent = failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    jobs = claim_jobs(max(1, options['batch_size']))
+                    if not jobs:
+                        if options['once']:
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    batch_sent, batch_failed = process_jobs(jobs, pool.map)
+                    sent += batch_sent
+                    failed += batch_failed
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING('Stopping worker...'))
+
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} invoices, {failed} failed attempts'))
@@ -0,0 +1,41 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from billing.bulk_pdfs import default_workers, write_zip
+from billing.models import Bill
+
+
+class Command(BaseCommand):
+    help = 'Render the PDFs of all matching bills into one ZIP archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the ZIP file to write')
+        parser.add_argument('--from', dest='date_from', help='First day to export (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last day to export (YYYY-MM-DD)')
+        parser.add_argument('--customer', help='Only bills whose customer name contains this text')
+        parser.add_argument('--workers', type=int, default=default_workers(),
+                            help='Number of PDF rendering processes (default: CPU count)')
+
+    def handle(self, *args, **options):
+        for name in ('date_from', 'date_to'):
+            if options[name]:
+                try:
+                    datetime.strptime(options[name], '%Y-%m-%d')
+                except ValueError:
+                    raise CommandError(f'Invalid date "{options[name]}", expected YYYY-MM-DD')
+
+        bills = Bill.objects.filter_params(
+            customer=options['customer'],
+            date_from=options['date_from'],
+            date_to=options['date_to'],
+        ).order_by('created_at', 'id')
+
+        started = time.monotonic()
+        with open(options['output'], 'wb') as f:
+            count = write_zip(f, bills, workers=max(1, options['workers']))
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} PDFs to {options["output"]} in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from billing.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or backfill) the daily sales rollups from existing bills'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        date_from = self._parse_date(options['date_from'])
+        date_to = self._parse_date(options['date_to'])
+
+        daily_count, category_count = rebuild(date_from, date_to)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {daily_count} daily rows and {category_count} category rows'
+        ))
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}", expected YYYY-MM-DD')
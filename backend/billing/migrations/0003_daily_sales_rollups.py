@@ -0,0 +1,91 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:47
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """Populate the rollups from existing bills (same logic as billing.rollups.rebuild)"""
+    Bill = apps.get_model('billing', 'Bill')
+    BillItem = apps.get_model('billing', 'BillItem')
+    DailySales = apps.get_model('billing', 'DailySales')
+    DailyCategorySales = apps.get_model('billing', 'DailyCategorySales')
+
+    items_by_day = BillItem.objects.annotate(day=TruncDate('bill__created_at'))
+    units_by_day = dict(
+        items_by_day.values('day').annotate(units=Sum('quantity')).order_by()
+        .values_list('day', 'units')
+    )
+
+    DailySales.objects.bulk_create([
+        DailySales(
+            day=row['day'],
+            bill_count=row['bill_count'],
+            units_sold=units_by_day.get(row['day'], 0),
+            total_amount=row['total'] or 0,
+            final_amount=row['final'] or 0,
+        )
+        for row in Bill.objects.annotate(day=TruncDate('created_at')).values('day').annotate(
+            bill_count=Count('id'), total=Sum('total_amount'), final=Sum('final_amount')
+        ).order_by()
+    ], batch_size=1000)
+
+    DailyCategorySales.objects.bulk_create([
+        DailyCategorySales(
+            day=row['day'],
+            category=row['item__category'],
+            bill_count=row['bill_count'],
+            units_sold=row['units'],
+            total_amount=row['total'] or 0,
+        )
+        for row in items_by_day.values('day', 'item__category').annotate(
+            bill_count=Count('bill', distinct=True), units=Sum('quantity'), total=Sum('subtotal')
+        ).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_alter_bill_table_alter_billitem_table'),
+        ('inventory', '0003_stock_low_stock_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(choices=[('SHIRT', 'Shirt'), ('TSHIRT', 'T-Shirt'), ('PANTS', 'Pants'), ('JEANS', 'Jeans'), ('JACKET', 'Jacket'), ('SWEATER', 'Sweater')], max_length=20)),
+                ('bill_count', models.IntegerField(default=0)),
+                ('units_sold', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'dailyCategorySales',
+                'ordering': ['-day', 'category'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('bill_count', models.IntegerField(default=0)),
+                ('units_sold', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('final_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'dailySales',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailycategorysales',
+            constraint=models.UniqueConstraint(fields=('day', 'category'), name='dailyCategorySales_day_category_uniq'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, transaction
+
+
+INDEX_NAME = 'customerBills_customer_trgm_idx'
+
+
+def create_trigram_index(apps, schema_editor):
+    """
+    Back customer_name__icontains with a pg_trgm GIN index.
+
+    Django renders icontains as UPPER("customer_name"::text) LIKE UPPER(%s),
+    so the index is built on that exact expression. On other databases, or
+    when the extension cannot be installed (no privilege), the index is
+    skipped and the search falls back to a sequential scan.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except Exception as e:
+        print(f"pg_trgm not available, skipping {INDEX_NAME}: {str(e)}")
+        return
+
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS "{INDEX_NAME}" ON "customerBills" '
+        f'USING gin ((UPPER("customer_name"::text)) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{INDEX_NAME}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
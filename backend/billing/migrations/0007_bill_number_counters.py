@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0006_invoice_delivery_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('last_number', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'billNumberCounters',
+                'ordering': ['-day'],
+            },
+        ),
+    ]
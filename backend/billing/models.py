@@ -1,6 +1,52 @@
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.core.validators import MinValueValidator
-from inventory.models import ClothItem
+from inventory.models import ClothCategory, ClothItem
+
+
+class BillQuerySet(models.QuerySet):
+    def filter_params(self, customer=None, date_from=None, date_to=None):
+        """
+        Apply the customer / date range filters used by the bill list.
+
+        Dates are 'YYYY-MM-DD' strings; invalid dates are ignored and
+        date_to includes the whole day.
+        """
+        queryset = self
+        
+        # Filter by customer name
+        if customer:
+            queryset = queryset.filter(customer_name__icontains=customer)
+        
+        if date_from:
+            # Convert date string to datetime at start of day
+            try:
+                date_from_dt = datetime.strptime(date_from, '%Y-%m-%d')
+                queryset = queryset.filter(created_at__gte=date_from_dt)
+            except ValueError:
+                pass
+        
+        if date_to:
+            # Convert date string to datetime at end of day
+            try:
+                date_to_dt = datetime.strptime(date_to, '%Y-%m-%d')
+                # Add one day and filter less than (to include entire day)
+                date_to_dt = date_to_dt + timedelta(days=1)
+                queryset = queryset.filter(created_at__lt=date_to_dt)
+            except ValueError:
+                pass
+        
+        return queryset
+
+    def with_items(self):
+        """Prefetch items (with their cloth item and stock) and invoice deliveries"""
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=BillItem.objects.select_related('item__stock')),
+            'deliveries'
+        )
 
 
 class Bill(models.Model):
@@ -34,16 +80,30 @@ class Bill(models.Model):
     )
     notes = models.TextField(blank=True)
 
+    objects = BillQuerySet.as_manager()
+
     class Meta:
         db_table = 'customerBills'
         ordering = ['-created_at']
+        indexes = [
+            # Backs keyset pagination and created_at range filters
+            models.Index(fields=['created_at', 'id'], name='customerBills_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"Bill #{self.bill_number} - {self.customer_name}"
 
-    def calculate_totals(self):
-        """Calculate total, tax, and final amount"""
-        items_total = sum(item.subtotal for item in self.items.all())
+    def calculate_totals(self, items=None):
+        """
+        Calculate total, tax, and final amount
+
+        Args:
+            items: optional in-memory BillItem list; avoids re-querying
+                   self.items when the caller already holds the lines
+        """
+        if items is None:
+            items = self.items.all()
+        items_total = sum(item.subtotal for item in items)
         self.total_amount = items_total
         
         # Apply discount
@@ -52,7 +112,10 @@ class Bill(models.Model):
         
         # Apply tax
         tax_amount = (amount_after_discount * self.tax_rate) / 100
-        self.final_amount = amount_after_discount + tax_amount
+        # Round here so the in-memory value matches what the column stores
+        self.final_amount = (amount_after_discount + tax_amount).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_UP
+        )
         
         self.save()
 
@@ -91,3 +154,129 @@ class BillItem(models.Model):
         # Auto-calculate subtotal
         self.subtotal = self.quantity * self.unit_price
         super().save(*args, **kwargs)
+
+
+class DailySales(models.Model):
+    """Per-day sales totals, maintained incrementally as bills are created"""
+    day = models.DateField(unique=True)
+    bill_count = models.IntegerField(default=0)
+    units_sold = models.IntegerField(default=0)
+    total_amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+    final_amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+
+    class Meta:
+        db_table = 'dailySales'
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day}: {self.bill_count} bills, {self.final_amount}"
+
+
+class DailyCategorySales(models.Model):
+    """Per-day, per-category line totals (before bill discount and tax)"""
+    day = models.DateField()
+    category = models.CharField(max_length=20, choices=ClothCategory.choices)
+    bill_count = models.IntegerField(default=0)
+    units_sold = models.IntegerField(default=0)
+    total_amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+
+    class Meta:
+        db_table = 'dailyCategorySales'
+        ordering = ['-day', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='dailyCategorySales_day_category_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.category}: {self.total_amount}"
+
+
+class DeliveryStatus(models.TextChoices):
+    PENDING = 'PENDING', 'Pending'
+    SENDING = 'SENDING', 'Sending'
+    SENT = 'SENT', 'Sent'
+    FAILED = 'FAILED', 'Failed'
+
+
+class InvoiceDelivery(models.Model):
+    """Queued job to render a bill's PDF and email it to the customer"""
+    bill = models.ForeignKey(
+        Bill,
+        on_delete=models.CASCADE,
+        related_name='deliveries'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=DeliveryStatus.choices,
+        default=DeliveryStatus.PENDING
+    )
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'invoiceDeliveries'
+        ordering = ['-created_at']
+        indexes = [
+            # Workers poll for due jobs by status and next_attempt_at
+            models.Index(fields=['status', 'next_attempt_at'], name='invoiceDeliveries_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Invoice delivery for {self.bill.bill_number} ({self.status})"
+
+
+class BillNumberCounter(models.Model):
+    """Last bill number handed out for each day (see billing.numbering)"""
+    day = models.DateField(unique=True)
+    last_number = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'billNumberCounters'
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day}: {self.last_number}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Result of a bill creation request sent with an Idempotency-Key header.
+
+    The row is inserted before the bill is created and filled in with the
+    response afterwards (see billing.idempotency).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'idempotencyKeys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotencyKeys_user_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotencyKeys_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code or 'in progress'})"
@@ -0,0 +1,92 @@
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BillNumberCounter
+
+
+NUMBERING_DB = 'numbering'
+
+# Numbers reserved by this process but not handed out yet: {day: [next, end)}
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def format_bill_number(day, number):
+    return f"BILL-{day:%Y%m%d}-{number:06d}"
+
+
+def numbering_db():
+    """Database alias bill numbers are allocated on (see settings.DATABASES)"""
+    return NUMBERING_DB if NUMBERING_DB in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+def allocate(day, count=1):
+    """
+    Reserve `count` consecutive numbers for `day` from its counter row.
+
+    The counter row is created on first use and bumped with one UPDATE.
+    On the numbering connection this commits straight away, so the row is
+    only locked for that statement; on the default connection (SQLite) it
+    stays locked until the surrounding transaction ends.
+
+    Returns:
+        int: the first reserved number
+    """
+    using = numbering_db()
+    counters = BillNumberCounter.objects.using(using)
+    with transaction.atomic(using=using):
+        counters.bulk_create([BillNumberCounter(day=day)], ignore_conflicts=True)
+        counters.filter(day=day).update(last_number=F('last_number') + count)
+        last_number = counters.values_list('last_number', flat=True).get(day=day)
+    return last_number - count + 1
+
+
+def next_bill_number(day=None):
+    """
+    Return a bill number that has never been used, e.g. BILL-20240131-000042.
+
+    With BILL_NUMBER_BLOCK_SIZE = 1 every bill takes the next number from
+    the day's counter row, so numbers follow the order bills are numbered
+    in; a bill that fails after taking its number leaves a gap. Larger
+    blocks let each worker process reserve a range at once and hand it
+    out from memory, touching the hot row only once per block (numbers are
+    then unique but not in creation order, and unused ones are skipped
+    when a worker restarts).
+
+    On SQLite the counter update is part of the bill's transaction: a
+    rolled back bill also rolls back its number, so a block is only kept
+    for later bills once the transaction that reserved it commits.
+    """
+    day = day or timezone.localdate()
+    block_size = max(1, getattr(settings, 'BILL_NUMBER_BLOCK_SIZE', 1))
+
+    with _blocks_lock:
+        block = _blocks.get(day)
+        if block and block[0] < block[1]:
+            number = block[0]
+            block[0] += 1
+            return format_bill_number(day, number)
+
+    first = allocate(day, block_size)
+    if block_size > 1:
+        keep = partial(_keep_block, day, first + 1, first + block_size)
+        if numbering_db() == DEFAULT_DB_ALIAS:
+            transaction.on_commit(keep)
+        else:
+            keep()
+    return format_bill_number(day, first)
+
+
+def _keep_block(day, start, end):
+    with _blocks_lock:
+        block = _blocks.get(day)
+        if block and block[0] < block[1]:
+            # Another thread already refilled the block; these numbers are skipped
+            return
+        _blocks.clear()
+        _blocks[day] = [start, end]
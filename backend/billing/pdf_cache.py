@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+
+from .pdf_generator import bill_lines, generate_bill_pdf
+
+
+# Bytes in the cache as last counted plus what this process has written
+# since; the directory is only rescanned (and trimmed) when that estimate
+# passes the budget or the last count is older than SCAN_INTERVAL, since
+# other processes write to it too
+SCAN_INTERVAL = 60
+_usage = {'bytes': None, 'scanned_at': 0.0}
+_usage_lock = threading.Lock()
+
+
+def cache_dir():
+    return Path(getattr(settings, 'PDF_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'invoice_cache'))
+
+
+def bill_content_hash(bill):
+    """
+    Hash everything that ends up on the invoice.
+
+    Any change to the bill or to a line (including the item's name, size or
+    colour) produces a new hash, so stale PDFs are never served.
+    """
+    content = {
+        'bill': [
+            bill.bill_number, bill.customer_name, bill.customer_phone,
+            bill.customer_email, bill.created_at.isoformat(), str(bill.total_amount),
+            str(bill.discount), str(bill.tax_rate), str(bill.final_amount), bill.notes,
+        ],
+        'items': [
+            [bill_item.item.name, bill_item.item.size, bill_item.item.color,
+             bill_item.quantity, str(bill_item.unit_price), str(bill_item.subtotal)]
+            for bill_item in bill_lines(bill)
+        ],
+    }
+    payload = json.dumps(content, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_bill_pdf(bill):
+    """
+    Return the invoice PDF for a bill, rendering it only on a cache miss.
+
+    Returns:
+        tuple: (pdf bytes, etag, last modified datetime)
+    """
+    digest = bill_content_hash(bill)
+    path = _cache_path(bill, digest)
+
+    try:
+        pdf, stat = _read(path)
+    except FileNotFoundError:
+        pdf = generate_bill_pdf(bill)
+        _store(path, pdf)
+        stat = path.stat()
+        _added(stat.st_size - _remove_other_versions(path))
+
+    return pdf, digest, _last_modified(stat)
+
+
+def get_cached_bill_pdf(bill):
+    """
+    Like get_bill_pdf, but never renders.
+
+    Returns:
+        tuple or None: (pdf bytes, etag, last modified datetime), or None on a cache miss
+    """
+    digest = bill_content_hash(bill)
+    try:
+        pdf, stat = _read(_cache_path(bill, digest))
+    except FileNotFoundError:
+        return None
+    return pdf, digest, _last_modified(stat)
+
+
+def _cache_path(bill, digest):
+    # One directory per bill, so replacing an outdated PDF only looks at
+    # that bill's files
+    return cache_dir() / f'bill_{bill.pk}' / f'{digest[:32]}.pdf'
+
+
+def _read(path):
+    pdf = path.read_bytes()
+    # Bump the access time (used for LRU eviction), keep the mtime
+    stat = path.stat()
+    os.utime(path, (time.time(), stat.st_mtime))
+    return pdf, stat
+
+
+def _last_modified(stat):
+    return datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+
+
+def invalidate(bill_id):
+    """Remove cached PDFs for a bill"""
+    shutil.rmtree(cache_dir() / f'bill_{bill_id}', ignore_errors=True)
+
+
+def _remove_other_versions(path):
+    """Delete the bill's PDFs other than `path`; returns the bytes freed"""
+    freed = 0
+    with os.scandir(path.parent) as it:
+        for entry in it:
+            if entry.name.endswith('.pdf') and entry.name != path.name:
+                try:
+                    size = entry.stat().st_size
+                    os.unlink(entry.path)
+                    freed += size
+                except FileNotFoundError:
+                    pass
+    return freed
+
+
+def _store(path, pdf):
+    # Write to a temp file and rename so readers never see a partial PDF
+    for attempt in range(2):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            break
+        except FileNotFoundError:
+            # Eviction removed the (empty) directory in between
+            if attempt:
+                raise
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pdf)
+    os.replace(tmp_path, path)
+
+
+def _added(size):
+    """Account for `size` new bytes and trim the cache when it may be over budget"""
+    max_bytes = getattr(settings, 'PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+    with _usage_lock:
+        if _usage['bytes'] is not None:
+            _usage['bytes'] += size
+            if _usage['bytes'] <= max_bytes and time.monotonic() - _usage['scanned_at'] < SCAN_INTERVAL:
+                return
+        _usage['bytes'] = _evict(max_bytes)
+        _usage['scanned_at'] = time.monotonic()
+
+
+def _cached_files():
+    """(access time, size, path) of every cached PDF"""
+    for entry in _scan(cache_dir()):
+        if entry.is_dir():
+            files = [file for file in _scan(entry.path) if file.name.endswith('.pdf')]
+        elif entry.name.endswith('.pdf'):
+            # Flat layout of older releases
+            files = [entry]
+        else:
+            continue
+        for file in files:
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            yield stat.st_atime, stat.st_size, file.path
+
+
+def _scan(path):
+    # Other processes add and remove files while we look
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except FileNotFoundError:
+        return []
+
+
+def _evict(max_bytes):
+    """
+    Delete least recently used PDFs once the cache exceeds max_bytes.
+
+    Returns:
+        int: bytes left in the cache
+    """
+    entries = list(_cached_files())
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return total
+
+    # Trim to 90% so the next scan is many writes away
+    target = max_bytes * 0.9
+    for _, size, entry_path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.unlink(entry_path)
+            total -= size
+        except FileNotFoundError:
+            continue
+        try:
+            os.rmdir(os.path.dirname(entry_path))
+        except OSError:
+            # Not empty, or the cache directory itself
+            pass
+    return total
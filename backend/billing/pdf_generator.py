@@ -2,12 +2,129 @@ from io import BytesIO
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.pdfbase import pdfmetrics
 from datetime import datetime
 
 
+# Styles are built once at import time and shared by every invoice
+styles = getSampleStyleSheet()
+
+title_style = ParagraphStyle(
+    'CustomTitle',
+    parent=styles['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#2C3E50'),
+    spaceAfter=30,
+    alignment=TA_CENTER
+)
+
+heading_style = ParagraphStyle(
+    'CustomHeading',
+    parent=styles['Heading2'],
+    fontSize=14,
+    textColor=colors.HexColor('#34495E'),
+    spaceAfter=12
+)
+
+footer_style = ParagraphStyle(
+    'Footer',
+    parent=styles['Normal'],
+    fontSize=9,
+    textColor=colors.HexColor('#7F8C8D'),
+    alignment=TA_CENTER
+)
+
+bill_info_table_style = TableStyle([
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2C3E50')),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+
+items_table_style = TableStyle([
+    # Header
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    
+    # Body
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+    ('ALIGN', (4, 1), (-1, -1), 'RIGHT'),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#2C3E50')),
+    
+    # Grid
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#BDC3C7')),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    
+    # Alternating row colors
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#ECF0F1')]),
+])
+
+totals_table_style = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -2), 'Helvetica'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -2), 11),
+    ('FONTSIZE', (0, -1), (-1, -1), 14),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('TEXTCOLOR', (0, 0), (-1, -2), colors.HexColor('#2C3E50')),
+    ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#27AE60')),
+    ('LINEABOVE', (0, -1), (-1, -1), 2, colors.HexColor('#27AE60')),
+])
+
+items_col_widths = [0.5*inch, 2*inch, 0.8*inch, 1*inch, 0.6*inch, 1.2*inch, 1.2*inch]
+
+# Bills with more lines than this are laid out with LongTable, which sizes
+# rows incrementally instead of measuring the whole table up front
+LARGE_BILL_LINES = 100
+
+
+# Fonts the invoice layout uses (metrics are loaded on first use)
+INVOICE_FONTS = ('Helvetica', 'Helvetica-Bold')
+
+
+def warm_up():
+    """
+    Load the invoice fonts and lay out a small sample document.
+
+    Called in the gunicorn master before workers are forked, so every
+    worker starts with the font metrics and ReportLab's lazily built
+    tables already in (shared) memory.
+    """
+    for name in INVOICE_FONTS:
+        pdfmetrics.getFont(name)
+    
+    doc = SimpleDocTemplate(BytesIO(), pagesize=letter)
+    items_table = Table([['#', 'Item', 'Subtotal'], ['1', 'Sample', '₹0.00']])
+    items_table.setStyle(items_table_style)
+    doc.build([
+        Paragraph("CLOTH SHOP INVOICE", title_style),
+        Paragraph("ITEMS", heading_style),
+        items_table,
+        Paragraph("Thank you for your business!", footer_style),
+    ])
+
+
+def bill_lines(bill):
+    """
+    Bill items with their cloth item loaded.
+
+    Uses the prefetched items when the bill came from Bill.objects.with_items(),
+    otherwise fetches them with select_related('item') in one query.
+    """
+    if 'items' in getattr(bill, '_prefetched_objects_cache', {}):
+        return list(bill.items.all())
+    return list(bill.items.select_related('item'))
+
+
 def generate_bill_pdf(bill):
     """Generate PDF for a bill"""
     buffer = BytesIO()
@@ -16,25 +133,6 @@ def generate_bill_pdf(bill):
     # Container for the 'Flowable' objects
     elements = []
     
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2C3E50'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#34495E'),
-        spaceAfter=12
-    )
-    
     # Title
     title = Paragraph("CLOTH SHOP INVOICE", title_style)
     elements.append(title)
@@ -50,13 +148,7 @@ def generate_bill_pdf(bill):
         bill_info_data.append(['Email:', bill.customer_email, '', ''])
     
     bill_info_table = Table(bill_info_data, colWidths=[1.5*inch, 2.5*inch, 1*inch, 2*inch])
-    bill_info_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2C3E50')),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
+    bill_info_table.setStyle(bill_info_table_style)
     
     elements.append(bill_info_table)
     elements.append(Spacer(1, 0.3*inch))
@@ -68,7 +160,8 @@ def generate_bill_pdf(bill):
     # Items table
     items_data = [['#', 'Item', 'Size', 'Color', 'Qty', 'Unit Price', 'Subtotal']]
     
-    for idx, bill_item in enumerate(bill.items.all(), 1):
+    lines = bill_lines(bill)
+    for idx, bill_item in enumerate(lines, 1):
         items_data.append([
             str(idx),
             bill_item.item.name,
@@ -79,29 +172,11 @@ def generate_bill_pdf(bill):
             f'₹{bill_item.subtotal:.2f}'
         ])
     
-    items_table = Table(items_data, colWidths=[0.5*inch, 2*inch, 0.8*inch, 1*inch, 0.6*inch, 1.2*inch, 1.2*inch])
-    items_table.setStyle(TableStyle([
-        # Header
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        
-        # Body
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-        ('ALIGN', (4, 1), (-1, -1), 'RIGHT'),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#2C3E50')),
-        
-        # Grid
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#BDC3C7')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        
-        # Alternating row colors
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#ECF0F1')]),
-    ]))
+    if len(lines) > LARGE_BILL_LINES:
+        items_table = LongTable(items_data, colWidths=items_col_widths, repeatRows=1)
+    else:
+        items_table = Table(items_data, colWidths=items_col_widths, repeatRows=1)
+    items_table.setStyle(items_table_style)
     
     elements.append(items_table)
     elements.append(Spacer(1, 0.3*inch))
@@ -123,17 +198,7 @@ def generate_bill_pdf(bill):
     totals_data.append(['TOTAL:', f'₹{bill.final_amount:.2f}'])
     
     totals_table = Table(totals_data, colWidths=[5.5*inch, 1.5*inch])
-    totals_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -2), 'Helvetica'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -2), 11),
-        ('FONTSIZE', (0, -1), (-1, -1), 14),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('TEXTCOLOR', (0, 0), (-1, -2), colors.HexColor('#2C3E50')),
-        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#27AE60')),
-        ('LINEABOVE', (0, -1), (-1, -1), 2, colors.HexColor('#27AE60')),
-    ]))
+    totals_table.setStyle(totals_table_style)
     
     elements.append(totals_table)
     
@@ -147,13 +212,6 @@ def generate_bill_pdf(bill):
     
     # Footer
     elements.append(Spacer(1, 0.5*inch))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#7F8C8D'),
-        alignment=TA_CENTER
-    )
     footer = Paragraph("Thank you for your business!", footer_style)
     elements.append(footer)
     
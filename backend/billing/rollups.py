@@ -0,0 +1,179 @@
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate, TruncMonth, TruncYear
+from django.utils import timezone
+
+from .models import Bill, BillItem, DailyCategorySales, DailySales
+
+
+PERIODS = {
+    'day': None,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+
+def record_bill(bill, bill_items, sign=1):
+    """
+    Add a bill to the daily rollups (or remove it with sign=-1).
+
+    Runs in the caller's transaction and costs four queries whatever the
+    bill size: the day/category rows are created if missing, then each
+    table is incremented with a single UPDATE.
+
+    Args:
+        bill: saved Bill with totals calculated
+        bill_items: the bill's BillItem rows, with item loaded
+        sign: 1 to add the bill, -1 to remove it
+    """
+    day = timezone.localdate(bill.created_at)
+
+    units_sold = 0
+    categories = {}
+    for bill_item in bill_items:
+        units_sold += bill_item.quantity
+        units, amount = categories.get(bill_item.item.category, (0, 0))
+        categories[bill_item.item.category] = (
+            units + bill_item.quantity,
+            amount + bill_item.subtotal
+        )
+
+    DailySales.objects.bulk_create([DailySales(day=day)], ignore_conflicts=True)
+    DailySales.objects.filter(day=day).update(
+        bill_count=F('bill_count') + sign,
+        units_sold=F('units_sold') + sign * units_sold,
+        total_amount=F('total_amount') + sign * bill.total_amount,
+        final_amount=F('final_amount') + sign * bill.final_amount
+    )
+
+    if not categories:
+        return
+
+    DailyCategorySales.objects.bulk_create(
+        [DailyCategorySales(day=day, category=category) for category in categories],
+        ignore_conflicts=True
+    )
+    DailyCategorySales.objects.filter(day=day, category__in=categories).update(
+        bill_count=F('bill_count') + sign,
+        units_sold=F('units_sold') + Case(
+            *[When(category=category, then=Value(sign * units))
+              for category, (units, _) in categories.items()],
+            output_field=IntegerField()
+        ),
+        total_amount=F('total_amount') + Case(
+            *[When(category=category, then=Value(sign * amount))
+              for category, (_, amount) in categories.items()],
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        )
+    )
+
+
+@transaction.atomic
+def rebuild(date_from=None, date_to=None):
+    """
+    Recompute the rollups from customerBills/billItems.
+
+    Args:
+        date_from, date_to: optional inclusive date bounds; the whole
+                            history is rebuilt when both are omitted
+
+    Returns:
+        tuple: (daily rows written, category rows written)
+    """
+    day_filter = {}
+    if date_from:
+        day_filter['day__gte'] = date_from
+    if date_to:
+        day_filter['day__lte'] = date_to
+
+    DailySales.objects.filter(**day_filter).delete()
+    DailyCategorySales.objects.filter(**day_filter).delete()
+
+    bills = Bill.objects.annotate(day=TruncDate('created_at')).filter(**day_filter)
+    units_by_day = dict(
+        BillItem.objects.annotate(day=TruncDate('bill__created_at'))
+        .filter(**day_filter)
+        .values('day')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+        .values_list('day', 'units')
+    )
+
+    daily_rows = [
+        DailySales(
+            day=row['day'],
+            bill_count=row['bill_count'],
+            units_sold=units_by_day.get(row['day'], 0),
+            total_amount=row['total'] or 0,
+            final_amount=row['final'] or 0
+        )
+        for row in bills.values('day').annotate(
+            bill_count=Count('id'),
+            total=Sum('total_amount'),
+            final=Sum('final_amount')
+        ).order_by()
+    ]
+
+    category_rows = [
+        DailyCategorySales(
+            day=row['day'],
+            category=row['item__category'],
+            bill_count=row['bill_count'],
+            units_sold=row['units'],
+            total_amount=row['total'] or 0
+        )
+        for row in BillItem.objects.annotate(day=TruncDate('bill__created_at'))
+        .filter(**day_filter)
+        .values('day', 'item__category')
+        .annotate(
+            bill_count=Count('bill', distinct=True),
+            units=Sum('quantity'),
+            total=Sum('subtotal')
+        ).order_by()
+    ]
+
+    DailySales.objects.bulk_create(daily_rows, batch_size=1000)
+    DailyCategorySales.objects.bulk_create(category_rows, batch_size=1000)
+    return len(daily_rows), len(category_rows)
+
+
+def sales_by_period(period='day', date_from=None, date_to=None):
+    """
+    Revenue totals grouped by day, month or year, read from the rollups.
+
+    Returns:
+        dict: {'results': [...per period...], 'categories': [...per category...]}
+    """
+    day_filter = {}
+    if date_from:
+        day_filter['day__gte'] = date_from
+    if date_to:
+        day_filter['day__lte'] = date_to
+
+    daily = DailySales.objects.filter(**day_filter)
+    trunc = PERIODS[period]
+    period_expr = F('day') if trunc is None else trunc('day')
+
+    results = (
+        daily.annotate(period=period_expr)
+        .values('period')
+        .annotate(
+            bill_count=Sum('bill_count'),
+            units_sold=Sum('units_sold'),
+            total_amount=Sum('total_amount'),
+            final_amount=Sum('final_amount')
+        )
+        .order_by('period')
+    )
+
+    categories = (
+        DailyCategorySales.objects.filter(**day_filter)
+        .values('category')
+        .annotate(
+            units_sold=Sum('units_sold'),
+            total_amount=Sum('total_amount')
+        )
+        .order_by('category')
+    )
+
+    return {'results': list(results), 'categories': list(categories)}
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from clothshop.serializers import SparseFieldsetMixin
 from .models import Bill, BillItem
 from inventory.serializers import ClothItemSerializer
 
@@ -14,17 +15,41 @@ class BillItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['subtotal']
 
 
-class BillSerializer(serializers.ModelSerializer):
+class BillSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = BillItemSerializer(many=True, read_only=True)
     created_at = serializers.DateTimeField(format='%d-%m-%Y %H:%M', read_only=True)
+    email_status = serializers.SerializerMethodField()
 
     class Meta:
         model = Bill
         fields = ['id', 'bill_number', 'customer_name', 'customer_phone', 
                   'customer_email', 'created_at', 'total_amount', 'discount', 
-                  'tax_rate', 'final_amount', 'notes', 'items']
+                  'tax_rate', 'final_amount', 'notes', 'items', 'email_status']
         read_only_fields = ['total_amount', 'final_amount']
 
+    def get_email_status(self, bill):
+        """Status of the latest invoice delivery, or None if no email was queued"""
+        deliveries = sorted(bill.deliveries.all(), key=lambda d: d.created_at)
+        if not deliveries:
+            return None
+        return deliveries[-1].status.lower()
+
+
+class BillListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Compact bill representation for list views; ?expand=items for the line items"""
+    item_count = serializers.IntegerField(read_only=True)
+    created_at = serializers.DateTimeField(format='%d-%m-%Y %H:%M', read_only=True)
+
+    expandable_fields = {
+        'items': BillItemSerializer(many=True, read_only=True),
+    }
+
+    class Meta:
+        model = Bill
+        fields = ['id', 'bill_number', 'customer_name', 'customer_phone',
+                  'customer_email', 'created_at', 'total_amount', 'discount',
+                  'tax_rate', 'final_amount', 'item_count']
+
 
 class CreateBillSerializer(serializers.Serializer):
     customer_name = serializers.CharField(max_length=200)
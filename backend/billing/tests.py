@@ -0,0 +1,700 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.db import connections, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from clothshop.testing import (
+    LOCMEM_CACHES, NO_CACHES, APITestMixin, bill_payload, make_items, use_temp_pdf_cache
+)
+from inventory.models import ClothCategory, ClothItem, MovementKind, Stock, StockMovement
+from . import numbering, pdf_cache, pdf_generator
+from .bulk_pdfs import _init_worker, pdf_filename, stream_zip
+from .checkout import CheckoutError, create_bill
+from .deliveries import BACKOFF_SECONDS, MAX_ATTEMPTS, STALE_AFTER, claim_jobs, process_jobs, record_failure
+from .email_utils import send_bill_emails
+from .models import (
+    Bill, BillItem, BillNumberCounter, DailyCategorySales, DailySales, DeliveryStatus, InvoiceDelivery
+)
+from .rollups import rebuild
+
+
+@override_settings(CACHES=NO_CACHES)
+class BillQueryCountTests(APITestMixin, TestCase):
+    """Bill reads run a fixed number of queries however many bills and lines there are"""
+
+    def setUp(self):
+        super().setUp()
+        self.items = make_items(5)
+
+    def create_bills(self, count, lines=2):
+        for _ in range(count):
+            response = self.client.post('/api/billing/bills/', bill_payload(self.items[:lines]), format='json')
+            self.assertEqual(response.status_code, 201)
+
+    def test_bill_list(self):
+        self.create_bills(2)
+        queries = self.assertQueriesIndependentOf(
+            lambda: self.client.get('/api/billing/bills/'),
+            lambda: self.create_bills(10, lines=5)
+        )
+        # one keyset page query, item counts annotated
+        self.assertEqual(queries, 1)
+
+    def test_bill_list_with_items(self):
+        self.create_bills(2)
+        queries = self.assertQueriesIndependentOf(
+            lambda: self.client.get('/api/billing/bills/?expand=items'),
+            lambda: self.create_bills(10, lines=5)
+        )
+        # page + lines (with item and stock) + invoice deliveries
+        self.assertEqual(queries, 3)
+
+    def test_bill_detail(self):
+        self.create_bills(1, lines=1)
+        bill_id = self.client.get('/api/billing/bills/').data['results'][0]['id']
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/billing/bills/{bill_id}/')
+        self.assertEqual(len(response.data['items']), 1)
+
+
+@override_settings(CACHES=NO_CACHES)
+class CheckoutQueryCountTests(APITestMixin, TestCase):
+    """Creating a bill runs a fixed number of queries however many lines it has"""
+
+    def setUp(self):
+        super().setUp()
+        self.items = make_items(20)
+
+    def checkout(self, lines, **fields):
+        payload = bill_payload(self.items[:lines], **fields)
+        response, queries = self.count_queries(
+            lambda: self.client.post('/api/billing/bills/', payload, format='json')
+        )
+        self.assertEqual(response.status_code, 201)
+        return queries
+
+    def test_query_count_independent_of_lines(self):
+        self.checkout(1)  # first bill of the day creates the counter and rollup rows
+        self.assertEqual(self.checkout(1), 21)
+        self.assertEqual(self.checkout(20), 21)
+        # + the invoice delivery row
+        self.assertEqual(self.checkout(20, customer_email='buyer@example.com'), 22)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConcurrentCheckoutTests(APITestMixin, TransactionTestCase):
+    """Checkouts racing for the same stock on separate connections (PostgreSQL)"""
+
+    def checkout_concurrently(self, payloads):
+        """POST every payload at once from its own thread; returns the status codes"""
+        barrier = threading.Barrier(len(payloads))
+
+        def post(payload):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                return client.post('/api/billing/bills/', payload, format='json').status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=len(payloads)) as pool:
+            return list(pool.map(post, payloads))
+
+    def test_no_oversell(self):
+        item = make_items(1, quantity=25)[0]
+        statuses = self.checkout_concurrently([bill_payload([item])] * 40)
+
+        self.assertEqual(statuses.count(201), 25)
+        self.assertEqual(statuses.count(400), 15)
+        self.assertEqual(Stock.objects.get(item=item).quantity, 0)
+        self.assertEqual(Bill.objects.count(), 25)
+
+    def test_no_lost_updates(self):
+        items = make_items(4, quantity=1000)
+        # Overlapping baskets listing the items in different orders
+        payloads = [
+            bill_payload(items[i % 4:] + items[:i % 4], quantity=2) if i % 2 else bill_payload(items[::-1])
+            for i in range(30)
+        ]
+        statuses = self.checkout_concurrently(payloads)
+
+        self.assertEqual(statuses, [201] * 30)
+        taken = 15 * 2 + 15 * 1
+        for stock in Stock.objects.filter(item__in=items):
+            self.assertEqual(stock.quantity, 1000 - taken)
+            sold = StockMovement.objects.filter(item_id=stock.item_id, kind=MovementKind.SALE)
+            self.assertEqual(sold.aggregate(total=Sum('change'))['total'], -taken)
+        self.assertEqual(len(set(Bill.objects.values_list('bill_number', flat=True))), 30)
+
+
+
+
+@override_settings(CACHES=NO_CACHES)
+class ExportTests(APITestMixin, TestCase):
+    """CSV / NDJSON exports hold every line of the filtered bills and nothing else"""
+
+    def setUp(self):
+        super().setUp()
+        items = make_items(3)
+        for customer, lines in (('Asha', 2), ('Ravi', 3), ('Asha Menon', 1)):
+            payload = dict(bill_payload(items[:lines], quantity=lines), customer_name=customer)
+            self.assertEqual(self.client.post('/api/billing/bills/', payload, format='json').status_code, 201)
+        self.expected = sorted(
+            BillItem.objects.filter(bill__customer_name__icontains='asha')
+            .values_list('bill__bill_number', 'item__sku', 'quantity')
+        )
+
+    def export(self, export_format):
+        response = self.client.get(f'/api/billing/bills/export/?export_format={export_format}&customer=asha')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv(self):
+        rows = list(csv.DictReader(self.export('csv').splitlines()))
+
+        self.assertEqual(len(self.expected), 3)
+        self.assertEqual(
+            sorted((row['bill_number'], row['sku'], int(row['quantity'])) for row in rows), self.expected
+        )
+
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self.export('ndjson').splitlines()]
+
+        self.assertEqual(sorted((row['bill_number'], row['sku'], row['quantity']) for row in rows), self.expected)
+        self.assertTrue(all(row['customer_name'].startswith('Asha') for row in rows))
+
+
+@override_settings(CACHES=NO_CACHES)
+class PdfArchiveTests(APITestMixin, TestCase):
+    """ZIP archives of bill PDFs, streamed as the PDFs are rendered"""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = use_temp_pdf_cache(self)
+        items = make_items(2)
+        for customer in ('Asha', 'Ravi', 'Asha Menon', 'Asha'):
+            payload = dict(bill_payload(items), customer_name=customer)
+            self.assertEqual(self.client.post('/api/billing/bills/', payload, format='json').status_code, 201)
+        self.bills = Bill.objects.filter(customer_name__icontains='asha')
+        self.expected = sorted(pdf_filename(bill) for bill in self.bills)
+
+    def assertArchiveOfBills(self, content):
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(sorted(archive.namelist()), self.expected)
+            for name in archive.namelist():
+                self.assertTrue(archive.read(name).startswith(b'%PDF'), name)
+
+    def test_archive_view(self):
+        # Rendered on threads here, so the PDFs go to this test's cache directory
+        with ThreadPoolExecutor(max_workers=2) as pool, mock.patch('billing.views.render_pool', return_value=pool):
+            response = self.client.get('/api/billing/bills/pdf_archive/?customer=asha')
+            content = b''.join(response.streaming_content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertArchiveOfBills(content)
+
+    def test_spawned_render_pool(self):
+        # Like render_pool(); the workers read the cache directory from the environment
+        with mock.patch.dict(os.environ, PDF_CACHE_DIR=str(self.cache_dir)), ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker
+        ) as pool:
+            content = b''.join(stream_zip(self.bills.order_by('created_at', 'id'), 1, pool))
+
+        self.assertArchiveOfBills(content)
+        self.assertEqual(len(list(self.cache_dir.glob('bill_*/*.pdf'))), len(self.expected))
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BillSyncTests(APITestMixin, TestCase):
+    """Uploads of bills queued by an offline terminal"""
+
+    def setUp(self):
+        super().setUp()
+        self.items = make_items(2, quantity=5)
+
+    def sync(self, *bills):
+        response = self.client.post('/api/billing/bills/sync/', {'bills': list(bills)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def queued(self, payload, client_id):
+        # As OfflineBills.enqueue stores it
+        return dict(payload, client_id=client_id, queued_at='2024-05-01T10:00:00.000Z')
+
+    def test_replays_bill_whose_post_response_was_lost(self):
+        payload = bill_payload(self.items)
+        posted = self.client.post('/api/billing/bills/', payload, format='json', HTTP_IDEMPOTENCY_KEY='bill-1')
+        self.assertEqual(posted.status_code, 201)
+
+        result = self.sync(self.queued(payload, 'bill-1'))['results'][0]
+
+        self.assertEqual(result['status'], 'created')
+        self.assertEqual(result['bill']['id'], posted.data['id'])
+        self.assertEqual(Bill.objects.count(), 1)
+
+    def test_key_reused_for_another_bill_is_rejected(self):
+        self.client.post('/api/billing/bills/', bill_payload(self.items), format='json', HTTP_IDEMPOTENCY_KEY='bill-1')
+
+        result = self.sync(self.queued(bill_payload(self.items, quantity=2), 'bill-1'))['results'][0]
+
+        self.assertEqual((result['status'], result['status_code']), ('rejected', 422))
+
+    def test_each_bill_stands_alone(self):
+        data = self.sync(
+            self.queued(bill_payload(self.items, quantity=3), 'a'),
+            self.queued(bill_payload(self.items, quantity=3), 'b'),
+            self.queued(bill_payload(self.items, quantity=2), 'c'),
+        )
+
+        self.assertEqual([result['status'] for result in data['results']], ['created', 'conflict', 'created'])
+        self.assertEqual(data['counts'], {'created': 2, 'conflict': 1})
+        self.assertEqual(Bill.objects.count(), 2)
+        self.assertFalse(Stock.objects.exclude(quantity=0).exists())
+        # Uploading the batch again creates nothing new
+        again = self.sync(self.queued(bill_payload(self.items, quantity=3), 'a'))
+        self.assertEqual(again['results'][0]['status'], 'created')
+        self.assertEqual(Bill.objects.count(), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BillAdminRollupTests(APITestMixin, TestCase):
+    """Bills changed in the admin leave the sales rollups as a rebuild would make them"""
+
+    def setUp(self):
+        super().setUp()
+        self.items = make_items(3)
+        ClothItem.objects.filter(pk=self.items[0].pk).update(category=ClothCategory.JEANS)
+        for quantity in range(1, 6):
+            self.client.post('/api/billing/bills/', bill_payload(self.items, quantity=quantity), format='json')
+        self.bills = list(Bill.objects.order_by('id'))
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+
+    def rollups(self):
+        # Rows emptied by a delete stay behind with zero bills; a rebuild drops them
+        return (
+            list(DailySales.objects.exclude(bill_count=0).order_by('day').values(
+                'day', 'bill_count', 'units_sold', 'total_amount', 'final_amount'
+            )),
+            list(DailyCategorySales.objects.exclude(bill_count=0).order_by('day', 'category').values(
+                'day', 'category', 'bill_count', 'units_sold', 'total_amount'
+            )),
+        )
+
+    def assertRollupsMatchRebuild(self):
+        incremental = self.rollups()
+        rebuild()
+        self.assertEqual(incremental, self.rollups())
+
+    def change_form(self, bill):
+        """POST data for the bill's admin change form, lines included, as it stands"""
+        data = {
+            field: getattr(bill, field)
+            for field in ('bill_number', 'customer_name', 'customer_phone', 'customer_email',
+                          'total_amount', 'discount', 'tax_rate', 'final_amount', 'notes')
+        }
+        bill_items = list(bill.items.order_by('id'))
+        data.update({
+            'items-TOTAL_FORMS': len(bill_items), 'items-INITIAL_FORMS': len(bill_items),
+            'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+        })
+        for index, bill_item in enumerate(bill_items):
+            for field in ('id', 'bill', 'item', 'quantity', 'unit_price', 'subtotal'):
+                data[f'items-{index}-{field}'] = getattr(bill_item, f'{field}_id' if field in ('bill', 'item') else field)
+        return data
+
+    def test_delete_bill(self):
+        response = self.client.post(f'/admin/billing/bill/{self.bills[0].pk}/delete/', {'post': 'yes'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Bill.objects.count(), 4)
+        self.assertRollupsMatchRebuild()
+
+    def test_delete_selected_bills(self):
+        response = self.client.post('/admin/billing/bill/', {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': [self.bills[1].pk, self.bills[3].pk],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Bill.objects.count(), 3)
+        self.assertRollupsMatchRebuild()
+
+    def test_edit_bill_lines(self):
+        bill = self.bills[2]
+        data = self.change_form(bill)
+        data['items-0-quantity'] = 7
+        data['items-1-DELETE'] = 'on'
+
+        response = self.client.post(f'/admin/billing/bill/{bill.pk}/change/', data)
+
+        self.assertEqual(response.status_code, 302)
+        bill.refresh_from_db()
+        self.assertEqual(bill.items.count(), 2)
+        self.assertEqual(bill.total_amount, sum(bill_item.subtotal for bill_item in bill.items.all()))
+        self.assertRollupsMatchRebuild()
+
+@override_settings(CACHES=NO_CACHES)
+class PdfCacheTests(APITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = use_temp_pdf_cache(self)
+
+        item = make_items(1)[0]
+        for _ in range(10):
+            self.client.post('/api/billing/bills/', bill_payload([item]), format='json')
+        self.bills = list(Bill.objects.with_items().order_by('id'))
+
+    def test_changed_bill_replaces_its_pdf(self):
+        bill = self.bills[0]
+        _, etag, _ = pdf_cache.get_bill_pdf(bill)
+        bill.notes = 'Exchange within 7 days'
+        bill.save()
+        _, new_etag, _ = pdf_cache.get_bill_pdf(bill)
+
+        self.assertNotEqual(etag, new_etag)
+        self.assertEqual(len(list((self.cache_dir / f'bill_{bill.pk}').iterdir())), 1)
+        pdf_cache.invalidate(bill.pk)
+        self.assertFalse((self.cache_dir / f'bill_{bill.pk}').exists())
+
+    def test_eviction_keeps_budget_without_scanning_every_miss(self):
+        size = len(pdf_cache.get_bill_pdf(self.bills[0])[0])
+        with override_settings(PDF_CACHE_MAX_BYTES=size * 4), \
+                mock.patch.object(pdf_cache, '_evict', wraps=pdf_cache._evict) as evict:
+            for bill in self.bills:
+                pdf_cache.get_bill_pdf(bill)
+
+        cached = sum(size for _, size, _ in pdf_cache._cached_files())
+        self.assertLessEqual(cached, size * 4)
+        self.assertLess(evict.call_count, len(self.bills))
+
+
+
+@override_settings(CACHES=NO_CACHES)
+class PdfGeneratorTests(APITestMixin, TestCase):
+    """Invoice rendering for small and very long bills"""
+
+    LINE_COUNTS = (1, 20, 200)
+
+    def setUp(self):
+        super().setUp()
+        items = make_items(max(self.LINE_COUNTS))
+        self.bills = {}
+        for lines in self.LINE_COUNTS:
+            response = self.client.post('/api/billing/bills/', bill_payload(items[:lines]), format='json')
+            self.bills[lines] = response.data['id']
+
+    def test_lines_load_in_one_query(self):
+        for lines, bill_id in self.bills.items():
+            bill = Bill.objects.get(pk=bill_id)
+            with self.assertNumQueries(1):
+                self.assertEqual(len(pdf_generator.bill_lines(bill)), lines)
+
+            bill = Bill.objects.with_items().get(pk=bill_id)
+            with self.assertNumQueries(0):
+                pdf_generator.bill_lines(bill)
+
+    def test_long_bills_use_long_table(self):
+        for lines, bill_id in self.bills.items():
+            bill = Bill.objects.get(pk=bill_id)
+            with mock.patch.object(pdf_generator, 'LongTable', wraps=pdf_generator.LongTable) as long_table, \
+                    self.assertNumQueries(1):
+                pdf = pdf_generator.generate_bill_pdf(bill)
+
+            self.assertTrue(pdf.startswith(b'%PDF'))
+            self.assertEqual(long_table.called, lines > pdf_generator.LARGE_BILL_LINES, lines)
+
+    def test_render_rate(self):
+        # Measured here: about 390 / 170 / 23 PDFs/s for 1 / 20 / 200 lines;
+        # the floors only catch a return to per-line queries or styles
+        floors = {1: 40, 20: 20, 200: 3}
+        pdf_generator.warm_up()
+        for lines, bill_id in self.bills.items():
+            bill = Bill.objects.with_items().get(pk=bill_id)
+            renders = 0
+            started = time.perf_counter()
+            while renders < 3 or time.perf_counter() - started < 0.3:
+                pdf_generator.generate_bill_pdf(bill)
+                renders += 1
+            rate = renders / (time.perf_counter() - started)
+            self.assertGreater(rate, floors[lines], f'{lines} lines: {rate:.1f} PDFs/s')
+
+@skipUnlessDBFeature('has_select_for_update')
+@override_settings(CACHES=LOCMEM_CACHES)
+class BillNumberingTests(TransactionTestCase):
+    """Bill numbers under concurrent checkouts (PostgreSQL)"""
+
+    databases = APITestMixin.databases
+
+    def setUp(self):
+        numbering._blocks.clear()
+        self.addCleanup(numbering._blocks.clear)
+
+    def in_threads(self, func, calls, threads=16):
+        def run(_):
+            try:
+                return func()
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(run, range(calls)))
+
+    def test_thousands_of_bills_without_duplicates_or_gaps(self):
+        items = make_items(10, quantity=10000)
+
+        def checkout():
+            with transaction.atomic():
+                return create_bill({'customer_name': 'Walk-in', 'items': [
+                    {'item_id': item.id, 'quantity': 1} for item in items[:3]
+                ]}).bill_number
+
+        numbers = self.in_threads(checkout, 2000)
+        self.assertEqual(
+            sorted(int(number.rsplit('-', 1)[1]) for number in numbers),
+            list(range(1, 2001))
+        )
+        self.assertEqual(Bill.objects.count(), 2000)
+
+    def test_refused_bill_does_not_use_a_number(self):
+        item = make_items(1, quantity=1)[0]
+        payload = {'customer_name': 'Walk-in', 'items': [{'item_id': item.id, 'quantity': 2}]}
+        with self.assertRaises(CheckoutError), transaction.atomic():
+            create_bill(payload)
+        self.assertFalse(BillNumberCounter.objects.exists())
+
+    def test_counter_is_not_locked_while_a_bill_is_open(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        with transaction.atomic():
+            numbering.next_bill_number()
+            # Another checkout gets its number while this transaction is still open
+            future = pool.submit(self.in_threads, numbering.next_bill_number, 1, 1)
+            self.assertTrue(future.result(timeout=10)[0].endswith('-000002'))
+
+    @override_settings(BILL_NUMBER_BLOCK_SIZE=50)
+    def test_blocks_are_unique_and_reused_inside_one_transaction(self):
+        numbers = self.in_threads(numbering.next_bill_number, 2000)
+        self.assertEqual(len(set(numbers)), 2000)
+
+        # e.g. an offline upload numbering many bills before it commits
+        used = BillNumberCounter.objects.get().last_number
+        with transaction.atomic():
+            for _ in range(100):
+                numbering.next_bill_number()
+        self.assertLessEqual(BillNumberCounter.objects.get().last_number - used, 100 + 50)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class InvoiceDeliveryTests(APITestMixin, TransactionTestCase):
+    """The invoice email queue, driven the way the deliver_invoices worker drives it"""
+
+    def setUp(self):
+        super().setUp()
+        use_temp_pdf_cache(self)
+        self.items = make_items(2)
+
+    def queue(self, count):
+        """Create `count` bills with a customer email; returns their delivery jobs"""
+        for _ in range(count):
+            response = self.client.post(
+                '/api/billing/bills/', bill_payload(self.items, customer_email='buyer@example.com'), format='json'
+            )
+            self.assertEqual(response.status_code, 201)
+        return list(InvoiceDelivery.objects.order_by('-id')[:count])
+
+    def email_status(self, job):
+        return self.client.get(f'/api/billing/bills/{job.bill_id}/').data['email_status']
+
+    def claim_in_thread(self, limit):
+        try:
+            return [job.pk for job in claim_jobs(limit)]
+        finally:
+            connections.close_all()
+
+    def test_claim_loads_bills_with_the_jobs(self):
+        def claim_and_read():
+            return [job.bill.bill_number for job in claim_jobs(10)]
+
+        self.queue(1)
+        _, queries = self.count_queries(claim_and_read)
+        self.queue(5)
+        jobs, more_queries = self.count_queries(claim_and_read)
+
+        self.assertEqual(len(jobs), 5)
+        self.assertEqual(more_queries, queries)
+
+    def test_sent_invoice(self):
+        job = self.queue(1)[0]
+        self.assertEqual(self.email_status(job), 'pending')
+
+        self.assertEqual(process_jobs(claim_jobs(10)), (1, 0))
+
+        self.assertEqual(self.email_status(job), 'sent')
+        self.assertEqual(mail.outbox[0].to, ['buyer@example.com'])
+        self.assertEqual(mail.outbox[0].attachments[0][2], 'application/pdf')
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_failed_send_is_retried_with_backoff(self):
+        job = self.queue(1)[0]
+        now = timezone.now()
+        with mock.patch('billing.email_utils.get_connection', side_effect=OSError('SMTP down')), \
+                mock.patch('billing.deliveries.timezone.now', return_value=now):
+            self.assertEqual(process_jobs(claim_jobs(10)), (0, 1))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), (DeliveryStatus.PENDING, 1, 'SMTP down'))
+        self.assertEqual(job.next_attempt_at, now + timedelta(seconds=BACKOFF_SECONDS))
+        self.assertEqual(self.email_status(job), 'pending')
+        # Not due again until the backoff has passed
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_backoff_doubles_until_the_job_fails(self):
+        job = self.queue(1)[0]
+        now = timezone.now()
+        with mock.patch('billing.deliveries.timezone.now', return_value=now):
+            for attempt in range(1, MAX_ATTEMPTS):
+                record_failure(job, 'SMTP down')
+                job.refresh_from_db()
+                self.assertEqual((job.status, job.attempts), (DeliveryStatus.PENDING, attempt))
+                self.assertEqual(job.next_attempt_at, now + timedelta(seconds=30 * 2 ** (attempt - 1)))
+
+            record_failure(job, 'SMTP down')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (DeliveryStatus.FAILED, MAX_ATTEMPTS))
+        self.assertEqual(self.email_status(job), 'failed')
+
+    def test_stale_sending_jobs_are_reclaimed(self):
+        stale, recent = self.queue(2)
+        now = timezone.now()
+        InvoiceDelivery.objects.filter(pk=stale.pk).update(
+            status=DeliveryStatus.SENDING, locked_at=now - STALE_AFTER - timedelta(seconds=1)
+        )
+        InvoiceDelivery.objects.filter(pk=recent.pk).update(
+            status=DeliveryStatus.SENDING, locked_at=now - STALE_AFTER / 2
+        )
+
+        self.assertEqual([job.pk for job in claim_jobs(10)], [stale.pk])
+
+    @skipUnlessDBFeature('has_select_for_update_skip_locked')
+    def test_locked_jobs_are_skipped(self):
+        jobs = self.queue(4)
+        with ThreadPoolExecutor(max_workers=1) as pool, transaction.atomic():
+            # Another worker is still claiming these two
+            held = list(InvoiceDelivery.objects.select_for_update().order_by('id')[:2])
+            claimed = pool.submit(self.claim_in_thread, 10).result(timeout=10)
+
+        self.assertEqual(set(claimed), {job.pk for job in jobs} - {job.pk for job in held})
+
+    @skipUnlessDBFeature('has_select_for_update_skip_locked')
+    def test_concurrent_workers_never_claim_a_job_twice(self):
+        jobs = self.queue(60)
+        barrier = threading.Barrier(8)
+
+        def worker(_):
+            barrier.wait()
+            claimed = []
+            while batch := self.claim_in_thread(3):
+                claimed.extend(batch)
+            return claimed
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            claimed = [pk for batch in pool.map(worker, range(8)) for pk in batch]
+
+        self.assertEqual(sorted(claimed), sorted(job.pk for job in jobs))
+
+
+class ConnectionCountingBackend(locmem.EmailBackend):
+    """
+    locmem backend that opens and closes connections like the SMTP one,
+    counting them, and refuses messages to fail@ addresses
+    """
+    opened = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connection = None
+
+    def open(self):
+        if self.connection is not None:
+            return False
+        self.connection = object()
+        ConnectionCountingBackend.opened += 1
+        return True
+
+    def close(self):
+        self.connection = None
+
+    def send_messages(self, messages):
+        if any(address.startswith('fail@') for message in messages for address in message.to):
+            raise OSError('Recipient refused')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='billing.tests.ConnectionCountingBackend', EMAIL_MAX_PER_SECOND=0)
+class SendBillEmailsTests(SimpleTestCase):
+    """Batches of invoices over one mail connection"""
+
+    PDF = b'%PDF-1.4 test'
+
+    def setUp(self):
+        ConnectionCountingBackend.opened = 0
+
+    def invoices(self, *emails):
+        return [
+            (Bill(bill_number=f'BILL-{i}', customer_name='Buyer', customer_email=email,
+                  final_amount=10, created_at=timezone.now()), self.PDF)
+            for i, email in enumerate(emails)
+        ]
+
+    def test_batch_uses_one_connection(self):
+        results = send_bill_emails(self.invoices(*['buyer@example.com'] * 20))
+
+        self.assertEqual([error for _, error in results], [None] * 20)
+        self.assertEqual(len(mail.outbox), 20)
+        self.assertEqual(ConnectionCountingBackend.opened, 1)
+
+    def test_result_per_message(self):
+        invoices = self.invoices('a@example.com', 'fail@example.com', 'b@example.com')
+        results = send_bill_emails(invoices)
+
+        self.assertEqual([bill for bill, _ in results], [bill for bill, _ in invoices])
+        self.assertEqual([error for _, error in results], [None, 'Recipient refused', None])
+        self.assertEqual([message.to for message in mail.outbox], [['a@example.com'], ['b@example.com']])
+        # The connection is opened again after the failed send
+        self.assertEqual(ConnectionCountingBackend.opened, 2)
+
+    def test_rate_cap(self):
+        with mock.patch('billing.email_utils.time.sleep') as sleep:
+            send_bill_emails(self.invoices(*['buyer@example.com'] * 5), max_per_second=20)
+
+        # 5 messages at 20/s: four waits of 50 ms between them
+        self.assertAlmostEqual(sum(call.args[0] for call in sleep.call_args_list), 0.2, delta=0.02)
+
+    def test_throughput(self):
+        count = 500
+        started = time.perf_counter()
+        send_bill_emails(self.invoices(*['buyer@example.com'] * count))
+        rate = count / (time.perf_counter() - started)
+
+        # Building and handing over a message takes a fraction of a millisecond
+        # (about 8700 messages/s measured); SMTP is what limits a real worker
+        self.assertGreater(rate, 500, f'{rate:.0f} messages/s')
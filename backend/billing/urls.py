@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BillViewSet
+from .views import BillViewSet, sales, summary
 
 router = DefaultRouter()
 router.register(r'bills', BillViewSet)
 
 urlpatterns = [
+    path('summary/', summary, name='billing-summary'),
+    path('sales/', sales, name='billing-sales'),
     path('', include(router.urls)),
 ]
@@ -1,156 +1,86 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.db import transaction
-from django.utils import timezone
-from django.http import HttpResponse
-from datetime import datetime, timedelta
-from .models import Bill, BillItem
-from .serializers import BillSerializer, CreateBillSerializer
-from inventory.models import ClothItem, Stock
-import random
-import string
+from django.db.models import Count, F, Q, Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from datetime import datetime
+from .models import Bill, DailySales
+from .serializers import BillSerializer, BillListSerializer, CreateBillSerializer
+from clothshop.pagination import KeysetPagination
+from clothshop.serializers import query_param_set
+from .checkout import CheckoutError, create_bill
+from .rollups import PERIODS, record_bill, sales_by_period
+from .exports import EXPORT_FORMATS, stream_bills
+from .pdf_cache import get_bill_pdf, invalidate as invalidate_pdf
+from .bulk_pdfs import render_pool, stream_zip
+from .idempotency import (
+    IDEMPOTENCY_HEADER, IdempotencyError, claim, complete, find_completed, request_hash
+)
+from inventory.models import ClothItem
+
+
+# Offline bill uploads: bills per request
+SYNC_MAX_BILLS = 500
+# Fields the offline queue adds to a bill; they are not part of the bill itself
+SYNC_ENTRY_FIELDS = ('client_id', 'queued_at')
 
 
 class BillViewSet(viewsets.ModelViewSet):
     queryset = Bill.objects.all()
     serializer_class = BillSerializer
     permission_classes = [IsAuthenticated]  # Require authentication for all actions
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        queryset = Bill.objects.all()
-        
-        # Filter by customer name
-        customer = self.request.query_params.get('customer', None)
-        if customer:
-            queryset = queryset.filter(customer_name__icontains=customer)
+        params = self.request.query_params
+        queryset = Bill.objects.filter_params(
+            customer=params.get('customer', None),
+            date_from=params.get('date_from', None),
+            date_to=params.get('date_to', None),
+        )
         
-        # Filter by date range
-        date_from = self.request.query_params.get('date_from', None)
-        date_to = self.request.query_params.get('date_to', None)
-        
-        if date_from:
-            # Convert date string to datetime at start of day
-            try:
-                date_from_dt = datetime.strptime(date_from, '%Y-%m-%d')
-                queryset = queryset.filter(created_at__gte=date_from_dt)
-            except ValueError:
-                pass
-        
-        if date_to:
-            # Convert date string to datetime at end of day
-            try:
-                date_to_dt = datetime.strptime(date_to, '%Y-%m-%d')
-                # Add one day and filter less than (to include entire day)
-                date_to_dt = date_to_dt + timedelta(days=1)
-                queryset = queryset.filter(created_at__lt=date_to_dt)
-            except ValueError:
-                pass
+        # List rows only carry an item count unless ?expand=items is asked for
+        # (ordering is applied by the keyset paginator)
+        if self.action == 'list':
+            queryset = queryset.annotate(item_count=Count('items'))
+            if 'items' in query_param_set(self.request, 'expand'):
+                queryset = queryset.with_items()
+        elif self.action not in ('export', 'pdf_archive'):
+            queryset = queryset.with_items()
         
         return queryset
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return BillListSerializer
+        return BillSerializer
+
     @transaction.atomic
     def create(self, request):
-        """Create a new bill with items"""
+        """
+        Create a new bill with items
+        
+        Send an Idempotency-Key header to make retries safe: a repeated
+        request with the same key returns the original response instead of
+        creating another bill.
+        """
         try:
-            serializer = CreateBillSerializer(data=request.data)
-            
-            if not serializer.is_valid():
-                print(f"Validation errors: {serializer.errors}")
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            
-            data = serializer.validated_data
-            
-            # Generate unique bill number
-            bill_number = self._generate_bill_number()
-            
-            # Create bill
-            bill = Bill.objects.create(
-                bill_number=bill_number,
-                customer_name=data['customer_name'],
-                customer_phone=data.get('customer_phone', ''),
-                customer_email=data.get('customer_email', ''),
-                discount=data.get('discount', 0),
-                tax_rate=data.get('tax_rate', 0),
-                notes=data.get('notes', '')
+            response_data, status_code = self._create_bill(
+                request.data, request.headers.get(IDEMPOTENCY_HEADER)
             )
-            
-            # Create bill items and update stock
-            for item_data in data['items']:
-                try:
-                    cloth_item = ClothItem.objects.get(id=item_data['item_id'])
-                    quantity = int(item_data['quantity'])
-                    
-                    # Check stock availability
-                    if hasattr(cloth_item, 'stock'):
-                        if cloth_item.stock.quantity < quantity:
-                            transaction.set_rollback(True)
-                            return Response(
-                                {'error': f'Insufficient stock for {cloth_item.name}. Available: {cloth_item.stock.quantity}, Requested: {quantity}'},
-                                status=status.HTTP_400_BAD_REQUEST
-                            )
-                        
-                        # Reduce stock
-                        cloth_item.stock.quantity -= quantity
-                        cloth_item.stock.save()
-                    
-                    # Create bill item
-                    BillItem.objects.create(
-                        bill=bill,
-                        item=cloth_item,
-                        quantity=quantity,
-                        unit_price=cloth_item.price
-                    )
-                
-                except ClothItem.DoesNotExist:
-                    transaction.set_rollback(True)
-                    return Response(
-                        {'error': f'Item with id {item_data["item_id"]} not found'},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-                except Exception as e:
-                    transaction.set_rollback(True)
-                    print(f"Error processing item {item_data['item_id']}: {str(e)}")
-                    return Response(
-                        {'error': f'Error processing item: {str(e)}'},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-            
-            # Calculate totals
-            bill.calculate_totals()
-            
-            # Return response immediately, email will be sent asynchronously
-            response_data = BillSerializer(bill).data
-            
-            # Try to send email in background (non-blocking)
-            if bill.customer_email:
-                try:
-                    from threading import Thread
-                    from .pdf_generator import generate_bill_pdf
-                    from .email_utils import send_bill_email
-                    
-                    def send_email_async():
-                        try:
-                            pdf_content = generate_bill_pdf(bill)
-                            send_bill_email(bill, pdf_content)
-                            print(f"Email sent successfully for bill {bill.bill_number}")
-                        except Exception as e:
-                            print(f"Background email sending failed: {str(e)}")
-                    
-                    # Start email sending in background thread
-                    email_thread = Thread(target=send_email_async)
-                    email_thread.daemon = True
-                    email_thread.start()
-                    
-                    response_data['email_status'] = 'sending'
-                except Exception as e:
-                    print(f"Failed to start email thread: {str(e)}")
-                    response_data['email_status'] = 'failed'
-            
-            return Response(response_data, status=status.HTTP_201_CREATED)
+            return Response(response_data, status=status_code)
+        
+        except (CheckoutError, IdempotencyError) as e:
+            transaction.set_rollback(True)
+            return Response({'error': e.message}, status=e.status_code)
             
         except Exception as e:
+            transaction.set_rollback(True)
             print(f"Bill creation error: {str(e)}")
             import traceback
             traceback.print_exc()
@@ -159,21 +89,223 @@ class BillViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    @action(detail=True, methods=['get'])
-    def download_pdf(self, request, pk=None):
-        """Generate and download PDF for a bill"""
-        from .pdf_generator import generate_bill_pdf
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Upload bills queued by an offline counter terminal.
         
-        bill = self.get_object()
-        pdf_buffer = generate_bill_pdf(bill)
+        Body: {"bills": [{"client_id": ..., <bill fields as for create>}, ...]}
+        Every bill is created and committed in its own transaction, like a
+        regular checkout, so one failing bill does not undo the others and
+        no locks are held across bills. client_id is used as the bill's
+        Idempotency-Key, so a batch can safely be uploaded again, also when
+        the bill's original POST did reach the server. Returns one result
+        per bill: created, conflict (not enough stock), rejected or failed.
+        """
+        bills = request.data.get('bills') if isinstance(request.data, dict) else None
+        if not isinstance(bills, list) or not bills:
+            return Response({'error': 'bills must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(bills) > SYNC_MAX_BILLS:
+            return Response(
+                {'error': f'At most {SYNC_MAX_BILLS} bills per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = [self._sync_bill(entry) for entry in bills]
+        
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        return Response({'results': results, 'counts': counts})
+
+    def _sync_bill(self, entry):
+        client_id = entry.get('client_id') if isinstance(entry, dict) else None
+        result = {'client_id': client_id}
+        if not client_id or not isinstance(client_id, str):
+            return dict(result, status='rejected', status_code=400, error='client_id is required')
         
-        response = HttpResponse(pdf_buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="bill_{bill.bill_number}.pdf"'
+        # Fingerprint the bill as it was POSTed, so a retry of a POST whose
+        # response was lost replays that bill instead of being refused
+        data = {field: value for field, value in entry.items() if field not in SYNC_ENTRY_FIELDS}
+        try:
+            with transaction.atomic():
+                response_data, status_code = self._create_bill(data, client_id)
+        except CheckoutError as e:
+            outcome = 'conflict' if e.code == 'insufficient_stock' else 'rejected'
+            return dict(result, status=outcome, status_code=e.status_code, error=e.message)
+        except IdempotencyError as e:
+            return dict(result, status='rejected', status_code=e.status_code, error=e.message)
+        except Exception as e:
+            print(f"Bill sync error: {str(e)}")
+            return dict(result, status='failed', status_code=500, error=f'Failed to create bill: {str(e)}')
         
-        return response
+        if status_code >= 400:
+            return dict(result, status='rejected', status_code=status_code, error=response_data)
+        return dict(result, status='created', status_code=status_code, bill=response_data)
 
-    def _generate_bill_number(self):
-        """Generate unique bill number"""
-        date_str = timezone.now().strftime('%Y%m%d')
-        random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        return f"BILL-{date_str}-{random_str}"
+    def _create_bill(self, data, key=None):
+        """
+        Validate and create one bill, honouring an optional idempotency key.
+        
+        Must run inside a transaction. CheckoutError and IdempotencyError
+        are raised for the caller to roll back and report.
+        
+        Returns:
+            tuple: (response data, HTTP status)
+        """
+        if key:
+            fingerprint = request_hash(data)
+            completed = find_completed(self.request.user, key, fingerprint)
+            if completed is not None:
+                return completed.response_body, completed.status_code
+        
+        serializer = CreateBillSerializer(data=data)
+        
+        if not serializer.is_valid():
+            print(f"Validation errors: {serializer.errors}")
+            return serializer.errors, status.HTTP_400_BAD_REQUEST
+        
+        if key:
+            # Concurrent retries with the same key wait here for the first one
+            record = claim(self.request.user, key, fingerprint)
+            if record.status_code is not None:
+                return record.response_body, record.status_code
+        
+        bill = create_bill(serializer.validated_data)
+        
+        # The invoice email is queued by create_bill and sent by the
+        # deliver_invoices worker; email_status reports its progress
+        response_data = BillSerializer(bill).data
+        if key:
+            complete(record, status.HTTP_201_CREATED, response_data)
+        
+        return response_data, status.HTTP_201_CREATED
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Take the bill back out of the daily sales rollups
+        record_bill(instance, instance.items.select_related('item'), sign=-1)
+        invalidate_pdf(instance.pk)
+        instance.delete()
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream bill lines as CSV or NDJSON (?export_format=csv|ndjson).
+        
+        Accepts the same customer/date_from/date_to filters as the list.
+        """
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f'export_format must be one of: {", ".join(EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return streaming_attachment(
+            stream_bills(self.get_queryset(), export_format),
+            EXPORT_FORMATS[export_format],
+            f'bills.{export_format}'
+        )
+
+    @action(detail=False, methods=['get'])
+    def pdf_archive(self, request):
+        """
+        Download the PDFs of every matching bill as one ZIP archive.
+        
+        Accepts the same customer/date_from/date_to filters as the list.
+        Bills are rendered on the shared render pool and streamed as they finish.
+        """
+        bills = self.get_queryset().order_by('created_at', 'id')
+        archive = stream_zip(bills, settings.PDF_RENDER_WORKERS, render_pool())
+        return streaming_attachment(archive, 'application/zip', 'bills.zip')
+
+    @action(detail=True, methods=['get'])
+    def download_pdf(self, request, pk=None):
+        """Download the PDF for a bill (cached; supports ETag / If-Modified-Since)"""
+        bill = self.get_object()
+        return bill_pdf_response(request, bill, *get_bill_pdf(bill))
+
+
+def streaming_attachment(content, content_type, filename):
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def bill_pdf_response(request, bill, pdf_content, etag, last_modified):
+    """Attachment response for a bill's PDF, or 304 when the client's copy is current"""
+    last_modified = int(last_modified.timestamp())
+    
+    response = HttpResponse(pdf_content, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="bill_{bill.bill_number}.pdf"'
+    response['ETag'] = quote_etag(etag)
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    
+    return get_conditional_response(
+        request, etag=quote_etag(etag), last_modified=last_modified, response=response
+    )
+
+
+# Aggregates behind the dashboard summary: one query per table
+INVENTORY_TOTALS = {
+    'item_count': Count('id'),
+    'total_stock': Sum('stock__quantity'),
+    'low_stock_count': Count(
+        'id', filter=Q(stock__quantity__lte=F('stock__low_stock_threshold'))
+    ),
+}
+# Bill totals come from the daily rollup, one row per trading day
+BILL_TOTALS = {
+    'bill_count': Sum('bill_count'),
+    'revenue': Sum('final_amount'),
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def summary(request):
+    """Shop-wide dashboard totals, computed with one aggregate query per table"""
+    return Response(summary_data(
+        ClothItem.objects.aggregate(**INVENTORY_TOTALS),
+        DailySales.objects.aggregate(**BILL_TOTALS),
+    ))
+
+
+def summary_data(inventory_totals, bill_totals):
+    bill_count = bill_totals['bill_count'] or 0
+    revenue = bill_totals['revenue'] or 0
+    
+    return {
+        'item_count': inventory_totals['item_count'],
+        'total_stock': inventory_totals['total_stock'] or 0,
+        'low_stock_count': inventory_totals['low_stock_count'],
+        'bill_count': bill_count,
+        'revenue': round(revenue, 2),
+        'average_ticket': round(revenue / bill_count, 2) if bill_count else 0,
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sales(request):
+    """Revenue by day, month or year (?period=) for an optional date range"""
+    period = request.query_params.get('period', 'day')
+    if period not in PERIODS:
+        return Response(
+            {'error': f'period must be one of: {", ".join(PERIODS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    date_range = {}
+    for param in ('date_from', 'date_to'):
+        value = request.query_params.get(param, None)
+        if value:
+            try:
+                date_range[param] = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                pass
+    
+    report = sales_by_period(period, **date_range)
+    return Response({'period': period, **report})
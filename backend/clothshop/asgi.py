@@ -1,5 +1,7 @@
 """
 ASGI config for clothshop project.
+
+Serve with the ASGI profile: gunicorn clothshop.asgi:application -c gunicorn_asgi_config.py
 """
 
 import os
@@ -7,5 +9,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'clothshop.settings')
+# Route the hot read endpoints and PDF downloads to their async views
+os.environ.setdefault('ROOT_URLCONF', 'clothshop.asgi_urls')
 
 application = get_asgi_application()
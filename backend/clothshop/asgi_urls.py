@@ -0,0 +1,21 @@
+"""
+URL configuration used when serving through clothshop.asgi.
+
+The hot read endpoints and the PDF / export downloads are swapped for async
+views (same URLs, same responses); everything else falls through to the
+regular URLconf and runs as a sync view.
+"""
+from django.urls import path, include
+from inventory import async_views as inventory_views
+from billing import async_views as billing_views
+
+urlpatterns = [
+    path('api/inventory/items/', inventory_views.item_list),
+    path('api/inventory/items/low_stock/', inventory_views.low_stock),
+    path('api/billing/summary/', billing_views.summary),
+    path('api/billing/bills/export/', billing_views.export),
+    path('api/billing/bills/pdf_archive/', billing_views.pdf_archive),
+    path('api/billing/bills/<int:pk>/download_pdf/', billing_views.download_pdf),
+    
+    path('', include('clothshop.urls')),
+]
@@ -0,0 +1,108 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.http import Http404, HttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+def json_response(data, status=200, headers=None):
+    """Render `data` exactly as DRF's JSONRenderer would"""
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status,
+        headers=headers,
+        content_type='application/json'
+    )
+
+
+async def authenticate(request):
+    """
+    Resolve the user of a DRF Request built around an async view's request.
+
+    Uses the same authenticators as the DRF views (JWT, then session).
+    They look the user up in the database, so they run off the event loop.
+    """
+    await sync_to_async(lambda: request.user)()
+    return request.user
+
+
+def async_api_view(view):
+    """
+    Decorator for async GET endpoints that require an authenticated user.
+
+    The view receives a DRF Request. APIExceptions (and Http404) become the
+    same JSON error responses DRF's exception handler produces.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        drf_request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        )
+        try:
+            if request.method not in ('GET', 'HEAD'):
+                raise exceptions.MethodNotAllowed(request.method)
+            user = await authenticate(drf_request)
+            if not user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            return await view(drf_request, *args, **kwargs)
+        except Http404:
+            return _error_response(exceptions.NotFound(), drf_request)
+        except exceptions.APIException as exc:
+            return _error_response(exc, drf_request)
+
+    # Like the DRF views: token-authenticated, so no CSRF check
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def _error_response(exc, drf_request):
+    headers = {}
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        # Same rule as APIView: 401 with a challenge, or 403 without one
+        auth_header = drf_request.authenticators[0].authenticate_header(drf_request)
+        if auth_header:
+            headers['WWW-Authenticate'] = auth_header
+        else:
+            exc.status_code = 403
+
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return json_response(data, status=exc.status_code, headers=headers)
+
+
+_DONE = object()
+
+
+async def iterate_in_thread(iterator):
+    """
+    Async generator over a blocking iterator (e.g. a streaming export).
+
+    Every step runs on one dedicated thread, so the event loop never waits
+    on it and a database cursor held by the iterator always stays on its
+    own connection. The connection is closed when the stream ends.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+    iterator = iter(iterator)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, next, iterator, _DONE)
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        await loop.run_in_executor(executor, _close_iterator, iterator)
+        executor.shutdown(wait=False)
+
+
+def _close_iterator(iterator):
+    close = getattr(iterator, 'close', None)
+    if close is not None:
+        close()
+    connections.close_all()
@@ -0,0 +1,167 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on a unique (timestamp, id) ordering.
+
+    Each page is fetched with WHERE (created_at, id) < (last seen) ORDER BY
+    ... LIMIT n, so fetching page 1000 costs the same as page 1. The total
+    COUNT(*) is only run when the client asks for it with ?count=true.
+    """
+    page_size = api_settings.PAGE_SIZE
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.page_queryset(queryset, request)
+        if self.count_requested:
+            self.count = queryset.count()
+        return self.finish_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views, using the async ORM"""
+        page_queryset = self.page_queryset(queryset, request)
+        if self.count_requested:
+            self.count = await queryset.acount()
+        return self.finish_page([row async for row in page_queryset])
+
+    def page_queryset(self, queryset, request):
+        """Filter and order `queryset` down to the rows of the requested page (plus one)"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.model_fields = [queryset.model._meta.get_field(name) for name in self.fields]
+
+        self.count = None
+        self.count_requested = request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor['reverse']
+        descending = self.ordering[0].startswith('-')
+
+        if self.cursor is not None:
+            # Walking forward through a descending ordering means "less than"
+            lookup = 'lt' if descending != reverse else 'gt'
+            first, second = self.fields
+            first_value, second_value = self.cursor['position']
+            queryset = queryset.filter(
+                Q(**{f'{first}__{lookup}': first_value}) |
+                Q(**{first: first_value, f'{second}__{lookup}': second_value})
+            )
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        """Trim the fetched rows to one page and work out the next/previous positions"""
+        reverse = self.cursor is not None and self.cursor['reverse']
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, self.cursor is not None
+
+        self.next_position = self.position(rows[-1]) if rows and has_next else None
+        self.previous_position = self.position(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_link(self.next_position, reverse=False)
+        response['previous'] = self.get_link(self.previous_position, reverse=True)
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def position(self, obj):
+        return [field.value_to_string(obj) for field in self.model_fields]
+
+    def get_link(self, position, reverse):
+        if position is None:
+            return None
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if len(payload['p']) != len(self.model_fields):
+                raise ValueError
+            position = [
+                field.to_python(value)
+                for field, value in zip(self.model_fields, payload['p'])
+            ]
+            return {'position': position, 'reverse': bool(payload.get('r'))}
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError,
+                binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    PageNumberPagination that can also page inside async views.
+
+    apaginate_queryset runs the COUNT and the page query through the async
+    ORM and leaves the page in place for get_paginated_response, so the
+    response body is identical to the sync version.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Paginator.count is a cached property; fill it so page() does not query
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+            raise NotFound(msg)
+
+        self.page.object_list = [row async for row in self.page.object_list]
+        self.request = request
+        return list(self.page)
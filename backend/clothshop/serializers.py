@@ -0,0 +1,39 @@
+import copy
+
+
+def query_param_set(request, name):
+    """Parse a comma separated query parameter (e.g. ?fields=a,b) into a set"""
+    if request is None:
+        return set()
+    value = request.query_params.get(name, '')
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for sparse fieldsets on GET requests.
+
+    ?fields=a,b,c  keeps only the listed fields
+    ?expand=x      swaps in the full nested representation for any field
+                   declared in expandable_fields
+
+    Only the top-level serializer reads the request; nested serializers
+    are left untouched.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+
+        for name in query_param_set(request, 'expand'):
+            if name in self.expandable_fields:
+                self.fields[name] = copy.deepcopy(self.expandable_fields[name])
+
+        fields = query_param_set(request, 'fields')
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
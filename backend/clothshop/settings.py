@@ -48,7 +48,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'clothshop.urls'
+# clothshop.asgi switches this to clothshop.asgi_urls (async read endpoints)
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'clothshop.urls')
 
 TEMPLATES = [
     {
@@ -67,6 +68,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'clothshop.wsgi.application'
+ASGI_APPLICATION = 'clothshop.asgi.application'
 
 
 # Database
@@ -96,6 +98,13 @@ else:
         }
     }
 
+# Bill numbers are allocated on a connection of their own that commits at
+# once, so the day's counter row is not locked for the length of a checkout.
+# SQLite allows one writer at a time anyway; it allocates on the bill's own
+# connection.
+if DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3':
+    DATABASES['numbering'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -138,6 +147,32 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered invoice PDFs, keyed by bill content hash (least recently used evicted)
+PDF_CACHE_DIR = Path(os.getenv('PDF_CACHE_DIR', MEDIA_ROOT / 'invoice_cache'))
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_MB', '200')) * 1024 * 1024
+# Processes rendering invoice PDFs and archives for the web views, per web worker
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', '1'))
+
+# Cache for catalogue reads (item lists and items). On disk by default so
+# every web worker sees the same entries; any Django cache backend can be
+# plugged in, e.g. CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache
+# for a single process.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '2000'))},
+    }
+}
+# Seconds a cached catalogue response is kept; changes invalidate it earlier
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', '300'))
+
+# Bill numbers reserved per worker process at a time (1 = strictly sequential)
+BILL_NUMBER_BLOCK_SIZE = int(os.getenv('BILL_NUMBER_BLOCK_SIZE', '1'))
+
+# How long an Idempotency-Key on bill creation is remembered
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -179,6 +214,8 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
+# Cap on invoice emails per second sent by the delivery worker (0 = no cap)
+EMAIL_MAX_PER_SECOND = float(os.getenv('EMAIL_MAX_PER_SECOND', '0'))
 
 # Production optimization
 if not DEBUG:
@@ -191,7 +228,8 @@ if not DEBUG:
     ]
     
     # Connection pooling for database
-    DATABASES['default']['CONN_MAX_AGE'] = 600
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = 600
     
     # Reduce session and cookie size
     SESSION_COOKIE_HTTPONLY = True
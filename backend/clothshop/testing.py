@@ -0,0 +1,83 @@
+import tempfile
+from contextlib import ExitStack
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from billing import pdf_cache
+from inventory.models import ClothItem, Stock
+
+
+# Tests use a per-process cache instead of the on-disk one in settings;
+# query-count tests switch caching off so every read reaches the database
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+NO_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def make_items(count, quantity=100, price='10.50', prefix='SKU'):
+    """Create `count` items, each with a stock row of `quantity` units"""
+    start = ClothItem.objects.count()
+    items = ClothItem.objects.bulk_create([
+        ClothItem(name=f'Item {start + i}', color='Red', price=Decimal(price), sku=f'{prefix}-{start + i:05d}')
+        for i in range(count)
+    ])
+    Stock.objects.bulk_create([Stock(item=item, quantity=quantity) for item in items])
+    return items
+
+
+def bill_payload(items, quantity=1, **fields):
+    """Body for POST /api/billing/bills/ taking `quantity` of every item"""
+    return dict(
+        {'customer_name': 'Walk-in', 'items': [{'item_id': item.id, 'quantity': quantity} for item in items]},
+        **fields
+    )
+
+
+def use_temp_pdf_cache(test):
+    """Point the PDF cache at a temporary directory for the rest of `test`; returns it"""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    cache_settings = override_settings(PDF_CACHE_DIR=Path(directory.name))
+    cache_settings.enable()
+    test.addCleanup(cache_settings.disable)
+    test.addCleanup(pdf_cache._usage.update, {'bytes': None, 'scanned_at': 0.0})
+    return Path(directory.name)
+
+
+class APITestMixin:
+    """Authenticated API client plus query-count assertions"""
+
+    # Bill numbers are allocated on their own connection (settings.DATABASES)
+    databases = set(settings.DATABASES)
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('cashier', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, func):
+        """Run func(); returns (its result, number of queries it ran on every connection)"""
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in self.databases]
+            result = func()
+        return result, sum(len(queries) for queries in captured)
+
+    def assertQueriesIndependentOf(self, func, grow):
+        """
+        Assert func() runs the same number of queries after grow() has added
+        rows, i.e. it has no N+1 query pattern.
+
+        Returns:
+            int: the number of queries func() runs
+        """
+        _, expected = self.count_queries(func)
+        grow()
+        self.assertEqual(self.count_queries(func)[1], expected)
+        return expected
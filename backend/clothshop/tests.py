@@ -0,0 +1,185 @@
+import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from billing.models import Bill
+from inventory.models import ClothItem
+from .pagination import KeysetPagination
+from .testing import NO_CACHES, APITestMixin, bill_payload, make_items, use_temp_pdf_cache
+
+
+@override_settings(CACHES=NO_CACHES)
+@mock.patch.object(KeysetPagination, 'page_size', 3)
+class KeysetPaginationTests(APITestMixin, TestCase):
+    """Cursor pages of the item list, newest first"""
+
+    URL = '/api/inventory/items/'
+
+    def setUp(self):
+        super().setUp()
+        items = make_items(10)
+        # Seven items created in the same instant, so pages split inside the tie
+        now = timezone.now()
+        ClothItem.objects.filter(pk__in=[item.pk for item in items[:7]]).update(created_at=now)
+        for offset, item in enumerate(items[7:], start=1):
+            ClothItem.objects.filter(pk=item.pk).update(created_at=now + timedelta(seconds=offset))
+        self.expected = list(ClothItem.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def walk(self, url, link):
+        """Follow `link` ('next' or 'previous') from url; returns the id lists of the pages"""
+        pages = []
+        while url:
+            data = self.get(url)
+            pages.append([row['id'] for row in data['results']])
+            url = data[link]
+        return pages
+
+    def test_next_visits_every_row_once(self):
+        pages = self.walk(self.URL, 'next')
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+        self.assertEqual([item_id for page in pages for item_id in page], self.expected)
+
+    def test_previous_walks_back_to_the_first_page(self):
+        forward = self.walk(self.URL, 'next')
+        last_page = self.get(self.URL)
+        while last_page['next']:
+            last_page = self.get(last_page['next'])
+
+        backward = self.walk(last_page['previous'], 'previous')
+
+        self.assertEqual(backward, forward[-2::-1])
+        self.assertIsNone(self.get(self.URL)['previous'])
+
+    def test_count_only_when_asked(self):
+        self.assertNotIn('count', self.get(self.URL))
+        data = self.get(f'{self.URL}?count=true')
+        self.assertEqual(data['count'], 10)
+        self.assertEqual(self.get(data['next'])['count'], 10)
+
+    def test_tampered_cursor(self):
+        def cursor(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for value in ('not-a-cursor', cursor({'p': ['1'], 'r': 0}), cursor({'p': ['yesterday', '1'], 'r': 0})):
+            with self.subTest(value=value):
+                response = self.client.get(self.URL, {'cursor': value})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+@override_settings(CACHES=NO_CACHES, ROOT_URLCONF='clothshop.asgi_urls')
+class AsyncApiTests(APITestMixin, TransactionTestCase):
+    """
+    The async views of the ASGI profile answer like the DRF views they stand
+    in for. Exports stream on their own thread (and connection), so the data
+    is committed rather than kept in a test transaction.
+    """
+
+    def setUp(self):
+        super().setUp()
+        use_temp_pdf_cache(self)
+        items = make_items(4, quantity=12)
+        for quantity in (1, 3):
+            self.client.post('/api/billing/bills/', bill_payload(items, quantity=quantity), format='json')
+        self.bill = Bill.objects.latest('id')
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    @sync_to_async
+    def sync_get(self, url, authenticated=True):
+        """The same request through the regular URLconf, i.e. the DRF views"""
+        client = APIClient()
+        if authenticated:
+            client.credentials(HTTP_AUTHORIZATION=self.auth['Authorization'])
+        with override_settings(ROOT_URLCONF='clothshop.urls'):
+            response = client.get(url)
+            if response.streaming:
+                response.content_bytes = b''.join(response.streaming_content)
+        return response
+
+    async def async_get(self, url, authenticated=True):
+        response = await self.async_client.get(url, headers=self.auth if authenticated else {})
+        if response.streaming:
+            response.content_bytes = b''.join([chunk async for chunk in response.streaming_content])
+        return response
+
+    async def assertSameResponse(self, url, status_code=200, authenticated=True):
+        expected = await self.sync_get(url, authenticated)
+        response = await self.async_get(url, authenticated)
+
+        self.assertEqual((response.status_code, expected.status_code), (status_code, status_code))
+        self.assertEqual(response['Content-Type'], expected['Content-Type'])
+        if response.streaming:
+            self.assertEqual(response.content_bytes, expected.content_bytes)
+        else:
+            self.assertEqual(response.json(), expected.json())
+        return response
+
+    async def test_item_list(self):
+        response = await self.assertSameResponse('/api/inventory/items/?expand=stock&count=true')
+        self.assertEqual(response.json()['count'], 4)
+
+    async def test_low_stock(self):
+        response = await self.assertSameResponse('/api/inventory/items/low_stock/')
+        self.assertEqual(response.json()['count'], 4)
+
+    async def test_summary(self):
+        response = await self.assertSameResponse('/api/billing/summary/')
+        self.assertEqual(response.json()['item_count'], 4)
+
+    async def test_export(self):
+        for export_format in ('csv', 'ndjson'):
+            with self.subTest(export_format=export_format):
+                response = await self.assertSameResponse(f'/api/billing/bills/export/?export_format={export_format}')
+                self.assertEqual(len(response.content_bytes.splitlines()), 8 + (export_format == 'csv'))
+        await self.assertSameResponse('/api/billing/bills/export/?export_format=xlsx', status_code=400)
+
+    async def test_download_pdf(self):
+        url = f'/api/billing/bills/{self.bill.pk}/download_pdf/'
+        # Rendered in-process on a cache miss, so the PDF lands in this test's cache directory
+        with ThreadPoolExecutor(max_workers=1) as pool, \
+                mock.patch('billing.async_views.render_pool', return_value=pool):
+            response = await self.async_get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+        # Served from the cache: the same bytes and ETag the DRF view serves
+        expected = await self.sync_get(url)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+        missing = await self.assertSameResponse(f'/api/billing/bills/{self.bill.pk + 100}/download_pdf/', 404)
+        self.assertEqual(missing.json(), {'detail': 'Not found.'})
+
+    async def test_unauthenticated(self):
+        for url in ('/api/inventory/items/', '/api/billing/summary/', '/api/billing/bills/export/'):
+            with self.subTest(url=url):
+                response = await self.assertSameResponse(url, 401, authenticated=False)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+    async def test_item_create_falls_through_to_drf(self):
+        item = {'name': 'Linen Shirt', 'sku': 'LIN-001', 'color': 'White', 'price': '30.00'}
+        response = await self.async_client.post(
+            '/api/inventory/items/', item, content_type='application/json', headers=self.auth
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['sku'], 'LIN-001')
+
+        response = await self.async_client.post(
+            '/api/inventory/items/', {'name': 'No price'}, content_type='application/json', headers=self.auth
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('price', response.json())
@@ -0,0 +1,40 @@
+import os
+
+# Gunicorn configuration for the ASGI profile:
+#   gunicorn clothshop.asgi:application -c gunicorn_asgi_config.py
+#
+# Each worker runs an event loop (uvicorn). Item list, low stock, summary and
+# the PDF / export downloads are async views. PDFs are rendered in a pool of
+# spawned processes shared by the worker (billing.bulk_pdfs.render_pool,
+# PDF_RENDER_WORKERS processes), so one slow invoice no longer blocks every
+# other request; cache and database reads run on threads.
+
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))  # 1 worker fits the free tier
+worker_class = 'uvicorn_worker.UvicornWorker'
+# The event loop keeps answering the arbiter's heartbeat while PDFs render in
+# the pool, so a worker that misses it for a minute is really stuck
+timeout = 60
+keepalive = 5
+graceful_timeout = 30
+
+# Logging
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+
+# Process naming
+proc_name = 'clothshop-asgi'
+
+# Server mechanics
+daemon = False
+pidfile = None
+umask = 0
+user = None
+group = None
+tmp_upload_dir = None
+
+# Memory management
+max_requests = 1000
+max_requests_jitter = 100
+
+preload_app = False
@@ -1,12 +1,53 @@
+import gc
+import math
 import multiprocessing
+import os
 
 # Gunicorn configuration for Render
-# Use minimal workers to save memory on free tier
+#   gunicorn clothshop.wsgi:application -c gunicorn_config.py
+#
+# Workers and threads are derived from the CPU count and a memory budget;
+# WEB_CONCURRENCY / WEB_THREADS pin them instead.
 
-workers = 1  # Use only 1 worker to minimize memory usage
-worker_class = 'sync'
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _cpu_count():
+    """CPUs this container may use: its cgroup quota if set, else the core count"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return multiprocessing.cpu_count()
+
+
+# Memory per process with the app preloaded (PSS after serving lists and
+# PDFs): the master holds Django, DRF and ReportLab (~65 MB with the first
+# worker's share); each extra worker measured ~25 MB, budgeted at 35 MB
+# for heap growth, as workers live until a restart (max_requests is off
+# unless WEB_MAX_REQUESTS is set)
+MASTER_MB = 65
+WORKER_MB = 35
+
+memory_budget_mb = _env_int('WEB_MEMORY_MB', 512)  # Render free tier
+# One process per CPU runs Python in parallel; threads cover I/O waits
+cpu_workers = _cpu_count()
+memory_workers = max(1, (memory_budget_mb - MASTER_MB) // WORKER_MB)
+
+workers = _env_int('WEB_CONCURRENCY', min(cpu_workers, memory_workers))
+# Threads serve other requests while one waits on the database or renders a PDF
+worker_class = 'gthread'
+threads = _env_int('WEB_THREADS', 4)
 worker_connections = 1000
-timeout = 300  # Increase timeout to 5 minutes to prevent worker timeouts
+# gthread workers keep heartbeating while a thread is busy, so this only
+# catches a worker that is really stuck
+timeout = 60
 keepalive = 5
 graceful_timeout = 30
 
@@ -25,10 +66,34 @@ umask = 0
 user = None
 group = None
 tmp_upload_dir = None
+# Heartbeat files in memory, not on a possibly slow container disk
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
 
 # Memory management
-max_requests = 1000
-max_requests_jitter = 100
+# Off by default: a recycling gthread worker drops a connection it has just
+# accepted (about one reset per restart, gunicorn 21 and 23), and with the
+# app preloaded most of a worker's memory is shared anyway. Set
+# WEB_MAX_REQUESTS (e.g. 1000) if worker memory creeps up.
+max_requests = _env_int('WEB_MAX_REQUESTS', 0)
+max_requests_jitter = max_requests // 10
+
+# Import Django, DRF and ReportLab once in the master; workers (including
+# the ones that replace a dead or recycled worker) are forked from it and
+# share those pages copy-on-write. Code changes need a full restart, not a HUP.
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded, before the first fork
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+    from billing.pdf_generator import warm_up
 
-# Prevent memory leaks
-preload_app = False
+    warm_up()
+    # Never hand a database connection opened while loading the app to the
+    # workers: close it here, once, instead of in every forked worker
+    connections.close_all()
+    # Keep the preloaded objects out of the garbage collector, whose
+    # bookkeeping writes would otherwise copy the shared pages into every worker
+    gc.freeze()
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import ClothItem, Stock
+from .models import ClothItem, MovementKind, Stock, StockMovement
+from .ledger import record_movements
+from .reservations import set_stock
 
 
 @admin.register(ClothItem)
@@ -8,9 +10,41 @@ class ClothItemAdmin(admin.ModelAdmin):
     list_filter = ['category', 'size', 'color']
     search_fields = ['name', 'sku', 'description']
 
+    def get_deleted_objects(self, objs, request):
+        # An item's ledger rows go with it, although they cannot be deleted on their own
+        deleted, model_count, perms_needed, protected = super().get_deleted_objects(objs, request)
+        perms_needed.discard(StockMovement._meta.verbose_name)
+        return deleted, model_count, perms_needed, protected
+
 
 @admin.register(Stock)
 class StockAdmin(admin.ModelAdmin):
     list_display = ['item', 'quantity', 'is_low_stock', 'is_out_of_stock', 'last_restocked']
     list_filter = ['last_restocked']
     search_fields = ['item__name', 'item__sku']
+
+    def save_model(self, request, obj, form, change):
+        # Quantity changes are written to the stock ledger like the API's
+        if change and 'quantity' in form.changed_data:
+            set_stock(obj.item_id, obj.quantity)
+        super().save_model(request, obj, form, change)
+        if not change and obj.quantity:
+            record_movements(MovementKind.RESTOCK, {obj.item_id: obj.quantity}, {obj.item_id: obj.quantity})
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """The ledger is append-only: rows are written by stock changes and can only be viewed here"""
+    list_display = ['item', 'kind', 'change', 'quantity_after', 'reference', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['item__name', 'item__sku', 'reference']
+    list_select_related = ['item']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,52 @@
+from asgiref.sync import sync_to_async
+
+from clothshop.async_api import async_api_view, json_response
+from clothshop.pagination import AsyncPageNumberPagination, KeysetPagination
+from .catalogue_cache import aget_list
+from .views import ClothItemViewSet
+
+
+# Async versions of the hot catalogue reads, routed by clothshop.asgi_urls.
+# They reuse the viewset's queryset and serializers and the same catalogue
+# cache entries, so responses match the DRF endpoints byte for byte.
+
+_item_list = ClothItemViewSet.as_view({'get': 'list', 'post': 'create'})
+
+
+async def item_list(request):
+    """
+    Item list (GET /api/inventory/items/) with the async ORM.
+
+    Ranked search (?search=) and item creation are left to the DRF view.
+    """
+    if request.method != 'GET' or request.GET.get('search'):
+        return await sync_to_async(_item_list)(request)
+    return await _keyset_item_list(request)
+
+
+item_list.csrf_exempt = True
+
+
+@async_api_view
+async def _keyset_item_list(request):
+    async def build():
+        view = ClothItemViewSet(request=request, action='list', format_kwarg=None)
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(view.get_queryset(), request)
+        serializer = view.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data).data
+
+    return json_response(await aget_list(request, build))
+
+
+@async_api_view
+async def low_stock(request):
+    """Items with low stock, most urgent first (GET /api/inventory/items/low_stock/)"""
+    async def build():
+        view = ClothItemViewSet(request=request, action='low_stock', format_kwarg=None)
+        paginator = AsyncPageNumberPagination()
+        page = await paginator.apaginate_queryset(view.get_low_stock_queryset(), request)
+        serializer = view.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data).data
+
+    return json_response(await aget_list(request, build))
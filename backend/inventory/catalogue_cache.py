@@ -0,0 +1,133 @@
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+# Catalogue reads (item lists, filtered views, single items) are cached
+# under keys that embed version tokens: one for every list, one for every
+# item entry (bumped by bulk changes) and one per item. A change replaces
+# the tokens once its transaction commits, so readers stop seeing the old
+# entries at once and those simply expire. A reader that raced the change
+# can only store under the old tokens, where nobody looks any more.
+LISTS_VERSION_KEY = 'catalogue:lists'
+ITEMS_VERSION_KEY = 'catalogue:items'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _item_version_key(item_id):
+    return f'catalogue:item:{item_id}'
+
+
+def _timeout():
+    return getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 300)
+
+
+def _entry_key(kind, versions, request):
+    # The absolute URI covers every filter, page and ?fields / ?expand, and
+    # the host that ends up in the next / previous links
+    digest = hashlib.sha256(request.build_absolute_uri().encode('utf-8')).hexdigest()[:32]
+    return f'catalogue:{kind}:{":".join(versions)}:{digest}'
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add() so readers arriving together settle on one token
+        if not cache.add(key, version, None):
+            version = cache.get(key) or version
+    return version
+
+
+async def _aversion(key):
+    version = await cache.aget(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key) or version
+    return version
+
+
+def _read_through(key, build):
+    data = cache.get(key)
+    if data is not None:
+        _count('hits')
+        return data
+    _count('misses')
+    data = build()
+    cache.set(key, data, _timeout())
+    return data
+
+
+def get_list(request, build):
+    """
+    Response data for a list request, from the cache or from build().
+
+    Args:
+        request: the DRF request (its URL is the cache key)
+        build: callable returning the response data on a miss
+    """
+    return _read_through(_entry_key('list', [_version(LISTS_VERSION_KEY)], request), build)
+
+
+async def aget_list(request, build):
+    """get_list for async views; build is a coroutine function"""
+    key = _entry_key('list', [await _aversion(LISTS_VERSION_KEY)], request)
+    data = await cache.aget(key)
+    if data is not None:
+        _count('hits')
+        return data
+    _count('misses')
+    data = await build()
+    await cache.aset(key, data, _timeout())
+    return data
+
+
+def get_item(item_id, request, build):
+    """Response data for one item, from the cache or from build()"""
+    versions = [_version(ITEMS_VERSION_KEY), _version(_item_version_key(item_id))]
+    return _read_through(_entry_key('item', versions, request), build)
+
+
+def invalidate(item_ids=None):
+    """
+    Drop cached lists and the cached entries of `item_ids` (every item
+    when None) once the current transaction commits.
+
+    Saves and deletes of items and stock rows call this through signals;
+    bulk writes, which send no signals, call it directly.
+    """
+    item_ids = None if item_ids is None else list(item_ids)
+    transaction.on_commit(lambda: _bump(item_ids))
+
+
+def _bump(item_ids):
+    keys = [LISTS_VERSION_KEY]
+    if item_ids is None:
+        keys.append(ITEMS_VERSION_KEY)
+    else:
+        keys.extend(_item_version_key(item_id) for item_id in item_ids)
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+
+def stats():
+    """Hit / miss counters of this process since it started"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else None,
+    }
@@ -0,0 +1,232 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ClothItem, MovementKind, Stock
+from .ledger import record_movements
+from .catalogue_cache import invalidate
+
+
+IMPORT_FORMATS = ('csv', 'json', 'ndjson')
+
+ITEM_FIELDS = ('sku', 'name', 'category', 'size', 'color', 'price', 'description')
+REQUIRED_FIELDS = ('sku', 'name', 'color', 'price')
+STOCK_FIELDS = ('quantity', 'low_stock_threshold')
+
+IMPORT_BATCH_SIZE = 1000
+
+# Error report is capped so a completely wrong file still gives a small response
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(Exception):
+    """Raised when the file itself cannot be parsed"""
+
+
+def read_rows(fileobj, import_format):
+    """
+    Yield one dict per record of a csv, json (array) or ndjson file.
+
+    `fileobj` may yield bytes or str. csv and ndjson are read line by line;
+    a json array is loaded in one go.
+    """
+    if import_format not in IMPORT_FORMATS:
+        raise ImportFormatError(f'Format must be one of: {", ".join(IMPORT_FORMATS)}')
+
+    lines = _text_lines(fileobj)
+
+    if import_format == 'csv':
+        yield from csv.DictReader(lines)
+        return
+
+    if import_format == 'json':
+        try:
+            records = json.loads(''.join(lines))
+        except ValueError as e:
+            raise ImportFormatError(f'Invalid JSON: {e}')
+        if not isinstance(records, list):
+            raise ImportFormatError('JSON imports must be an array of objects')
+        yield from records
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ImportFormatError(f'Invalid JSON on line {line_number}: {e}')
+
+
+def _text_lines(fileobj):
+    for line in fileobj:
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise ImportFormatError('File must be UTF-8 encoded')
+        yield line
+
+
+def validate_row(row):
+    """
+    Clean one import record with the model fields' own validation.
+
+    Optional columns that are missing or empty are left out of the result,
+    so existing items keep their current value for them.
+
+    Returns:
+        tuple: (item values, stock values, errors) - errors is a dict of
+               field name to messages, empty when the row is valid
+    """
+    if not isinstance(row, dict):
+        return {}, {}, {'non_field_errors': ['Expected an object']}
+
+    errors = {}
+
+    def clean(model, names):
+        values = {}
+        for name in names:
+            value = row.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+            elif isinstance(value, float):
+                # Go through str so 15.99 stays 15.99 rather than its binary expansion
+                value = str(value)
+            if value is None or value == '':
+                if name in REQUIRED_FIELDS:
+                    errors[name] = ['This field is required.']
+                continue
+            try:
+                values[name] = model._meta.get_field(name).clean(value, None)
+            except ValidationError as e:
+                errors[name] = e.messages
+        return values
+
+    item_values = clean(ClothItem, ITEM_FIELDS)
+    stock_values = clean(Stock, STOCK_FIELDS)
+    return item_values, stock_values, errors
+
+
+def import_items(rows, batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+    """
+    Upsert catalogue items (and their stock levels) by SKU.
+
+    Rows are validated as they are read; valid rows are written in batches
+    with a handful of bulk statements per batch, invalid rows are skipped
+    and reported. The whole import runs in one transaction.
+
+    Args:
+        rows: iterable of dicts (see read_rows)
+        batch_size: rows per bulk write
+        dry_run: validate only, write nothing
+
+    Returns:
+        dict: created / updated / invalid counts and the per-row errors
+    """
+    report = {'created': 0, 'updated': 0, 'invalid': 0, 'errors': []}
+    valid_rows = _valid_rows(rows, report)
+
+    with transaction.atomic():
+        while True:
+            batch = list(islice(valid_rows, batch_size))
+            if not batch:
+                break
+            created, updated = _write_batch(batch, dry_run)
+            report['created'] += created
+            report['updated'] += updated
+
+        # bulk_create sends no signals; an import can touch any item
+        if not dry_run:
+            invalidate()
+
+    return report
+
+
+def _valid_rows(rows, report):
+    for row_number, row in enumerate(rows, start=1):
+        item_values, stock_values, errors = validate_row(row)
+        if errors:
+            report['invalid'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'row': row_number, 'errors': errors})
+            continue
+        yield item_values, stock_values
+
+
+def _write_batch(batch, dry_run=False):
+    # A SKU repeated inside a batch: the last row wins
+    rows = {item_values['sku']: (item_values, stock_values) for item_values, stock_values in batch}
+
+    existing = dict(ClothItem.objects.filter(sku__in=rows).values_list('sku', 'id'))
+    new_skus = [sku for sku in rows if sku not in existing]
+    if dry_run:
+        return len(new_skus), len(existing)
+
+    # Rows only update the columns they carry, so group them by column set
+    for fields, group in _group_by_fields(item_values for item_values, _ in rows.values()):
+        ClothItem.objects.bulk_create(
+            [ClothItem(**item_values) for item_values in group],
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=[name for name in fields if name != 'sku'] + ['updated_at'],
+        )
+
+    item_ids = dict(existing)
+    item_ids.update(ClothItem.objects.filter(sku__in=new_skus).values_list('sku', 'id'))
+
+    # Current levels of the stock being overwritten, for the ledger
+    quantities = {
+        item_ids[sku]: stock_values['quantity']
+        for sku, (_, stock_values) in rows.items() if 'quantity' in stock_values
+    }
+    previous = dict(
+        Stock.objects.select_for_update()
+        .filter(item_id__in=quantities)
+        .order_by('item_id')
+        .values_list('item_id', 'quantity')
+    )
+
+    # Every item gets a Stock row; rows with a quantity set the level
+    Stock.objects.bulk_create(
+        [Stock(item_id=item_ids[sku], quantity=0) for sku in new_skus],
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    for fields, group in _group_by_fields(
+        dict(stock_values, item_id=item_ids[sku])
+        for sku, (_, stock_values) in rows.items() if stock_values
+    ):
+        update_fields = [name for name in fields if name != 'item_id']
+        if 'quantity' in update_fields:
+            update_fields.append('last_restocked')
+        Stock.objects.bulk_create(
+            [Stock(last_restocked=now, **stock_values) for stock_values in group],
+            update_conflicts=True,
+            unique_fields=['item'],
+            update_fields=update_fields,
+        )
+
+    # Opening stock of new items is a restock, overwriting existing stock an adjustment
+    record_movements(
+        {
+            item_id: MovementKind.ADJUSTMENT if item_id in previous else MovementKind.RESTOCK
+            for item_id in quantities
+        },
+        {item_id: quantity - previous.get(item_id, 0) for item_id, quantity in quantities.items()},
+        quantities,
+        reference='import'
+    )
+
+    return len(new_skus), len(existing)
+
+
+def _group_by_fields(values_list):
+    groups = {}
+    for values in values_list:
+        groups.setdefault(tuple(sorted(values)), []).append(values)
+    return groups.items()
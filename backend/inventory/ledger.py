@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import MovementKind, StockMovement, StockSnapshot
+
+
+# Movement kinds that can be given when stock is changed by hand
+MANUAL_KINDS = {
+    'restock': MovementKind.RESTOCK,
+    'adjustment': MovementKind.ADJUSTMENT,
+    'return': MovementKind.RETURN,
+}
+
+# Kinds that only ever bring stock in
+INBOUND_KINDS = (MovementKind.RESTOCK, MovementKind.RETURN)
+
+
+def record_movements(kind, changes, levels, reference=''):
+    """
+    Append ledger rows for a stock mutation with one INSERT.
+
+    Call in the same transaction as the UPDATE that changed the levels.
+
+    Args:
+        kind: MovementKind, or a dict of {item_id: MovementKind}
+        changes: dict of {item_id: signed change}; zero changes are skipped
+        levels: dict of {item_id: quantity after the change}
+        reference: free text such as a bill number
+    """
+    now = timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            item_id=item_id,
+            kind=kind[item_id] if isinstance(kind, dict) else kind,
+            change=change,
+            quantity_after=levels[item_id],
+            reference=reference,
+            created_at=now
+        )
+        for item_id, change in changes.items() if change
+    ])
+
+
+def latest_snapshot_time(moment):
+    return StockSnapshot.objects.filter(taken_at__lte=moment).aggregate(
+        taken_at=Max('taken_at')
+    )['taken_at']
+
+
+def stock_as_of(moment, item_ids=None):
+    """
+    Stock levels at `moment`: the latest snapshot taken at or before it
+    plus the sum of the movements since.
+
+    Returns:
+        dict: {item_id: quantity}; items that are absent had no stock
+    """
+    snapshots = StockSnapshot.objects.all()
+    movements = StockMovement.objects.filter(created_at__lte=moment)
+    if item_ids is not None:
+        snapshots = snapshots.filter(item_id__in=item_ids)
+        movements = movements.filter(item_id__in=item_ids)
+
+    levels = {}
+    taken_at = latest_snapshot_time(moment)
+    if taken_at is not None:
+        levels = dict(snapshots.filter(taken_at=taken_at).values_list('item_id', 'quantity'))
+        movements = movements.filter(created_at__gt=taken_at)
+
+    tail = movements.values('item_id').annotate(total=Sum('change')).order_by()
+    for item_id, total in tail.values_list('item_id', 'total'):
+        levels[item_id] = levels.get(item_id, 0) + total
+    return levels
+
+
+def movement_report(item_id, start, end):
+    """
+    Opening level, movements and closing level for one item over (start, end].
+
+    Returns:
+        dict: opening, closing, totals per kind and the movement rows
+    """
+    opening = stock_as_of(start, [item_id]).get(item_id, 0)
+    movements = list(
+        StockMovement.objects.filter(item_id=item_id, created_at__gt=start, created_at__lte=end)
+        .order_by('created_at', 'id')
+    )
+
+    totals = {kind: 0 for kind in MovementKind.values}
+    for movement in movements:
+        totals[movement.kind] += movement.change
+
+    return {
+        'opening': opening,
+        'closing': opening + sum(totals.values()),
+        'totals': totals,
+        'movements': movements,
+    }
+
+
+def take_snapshot(at=None):
+    """
+    Store the stock level of every item at `at` (default: start of today).
+
+    Built from the previous snapshot and the ledger, so it agrees with
+    stock_as_of. Taking the same snapshot twice does nothing.
+
+    Returns:
+        int: number of snapshot rows written
+    """
+    if at is None:
+        at = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    with transaction.atomic():
+        if StockSnapshot.objects.filter(taken_at=at).exists():
+            return 0
+        levels = stock_as_of(at)
+        snapshots = StockSnapshot.objects.bulk_create([
+            StockSnapshot(item_id=item_id, taken_at=at, quantity=quantity)
+            for item_id, quantity in levels.items() if quantity
+        ], batch_size=1000)
+    return len(snapshots)
+
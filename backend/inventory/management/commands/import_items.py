@@ -0,0 +1,45 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.imports import IMPORT_BATCH_SIZE, IMPORT_FORMATS, ImportFormatError, import_items, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import (upsert by SKU) cloth items and stock levels from a CSV, JSON or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--format', dest='import_format', choices=IMPORT_FORMATS,
+                            help='File format (default: taken from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Rows per bulk write')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without writing anything')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['import_format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f'Cannot tell the format of "{path}", use --format')
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                report = import_items(
+                    read_rows(f, import_format),
+                    batch_size=max(1, options['batch_size']),
+                    dry_run=options['dry_run']
+                )
+        except (OSError, UnicodeDecodeError, ImportFormatError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            messages = '; '.join(f'{field}: {" ".join(msgs)}' for field, msgs in error['errors'].items())
+            self.stdout.write(self.style.WARNING(f'Row {error["row"]}: {messages}'))
+        if report['invalid'] > len(report['errors']):
+            self.stdout.write(self.style.WARNING(
+                f'... {report["invalid"] - len(report["errors"])} more invalid rows not shown'
+            ))
+
+        prefix = 'Dry run: would create' if options['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {report["created"]} items, updated {report["updated"]}, '
+            f'skipped {report["invalid"]} invalid rows'
+        ))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from inventory.models import ClothItem, Stock
+from inventory.imports import import_items
+from inventory.models import ClothItem
 
 
 class Command(BaseCommand):
@@ -95,7 +96,7 @@ class Command(BaseCommand):
             {
                 'name': 'Formal Trousers',
                 'category': 'PANTS',
-                'size': '32',
+                'size': 'M',
                 'color': 'Black',
                 'price': 45.99,
                 'sku': 'PNT-BLK-32-001',
@@ -105,7 +106,7 @@ class Command(BaseCommand):
             {
                 'name': 'Formal Trousers',
                 'category': 'PANTS',
-                'size': '34',
+                'size': 'L',
                 'color': 'Grey',
                 'price': 45.99,
                 'sku': 'PNT-GRY-34-001',
@@ -115,7 +116,7 @@ class Command(BaseCommand):
             {
                 'name': 'Chino Pants',
                 'category': 'PANTS',
-                'size': '32',
+                'size': 'M',
                 'color': 'Khaki',
                 'price': 39.99,
                 'sku': 'PNT-KHK-32-002',
@@ -125,7 +126,7 @@ class Command(BaseCommand):
             {
                 'name': 'Cotton Pants',
                 'category': 'PANTS',
-                'size': '34',
+                'size': 'L',
                 'color': 'Navy',
                 'price': 42.99,
                 'sku': 'PNT-NVY-34-003',
@@ -137,7 +138,7 @@ class Command(BaseCommand):
             {
                 'name': 'Slim Fit Jeans',
                 'category': 'JEANS',
-                'size': '32',
+                'size': 'M',
                 'color': 'Dark Blue',
                 'price': 49.99,
                 'sku': 'JNS-DBL-32-001',
@@ -147,7 +148,7 @@ class Command(BaseCommand):
             {
                 'name': 'Slim Fit Jeans',
                 'category': 'JEANS',
-                'size': '34',
+                'size': 'L',
                 'color': 'Light Blue',
                 'price': 49.99,
                 'sku': 'JNS-LBL-34-001',
@@ -157,7 +158,7 @@ class Command(BaseCommand):
             {
                 'name': 'Regular Fit Jeans',
                 'category': 'JEANS',
-                'size': '32',
+                'size': 'M',
                 'color': 'Black',
                 'price': 52.99,
                 'sku': 'JNS-BLK-32-002',
@@ -167,7 +168,7 @@ class Command(BaseCommand):
             {
                 'name': 'Skinny Jeans',
                 'category': 'JEANS',
-                'size': '30',
+                'size': 'S',
                 'color': 'Grey',
                 'price': 47.99,
                 'sku': 'JNS-GRY-30-003',
@@ -240,36 +241,16 @@ class Command(BaseCommand):
             },
         ]
 
-        created_count = 0
-        updated_count = 0
-
-        for item_data in sample_items:
-            stock_quantity = item_data.pop('stock')
-            
-            # Check if item already exists
-            item, created = ClothItem.objects.get_or_create(
-                sku=item_data['sku'],
-                defaults=item_data
-            )
-            
-            if created:
-                created_count += 1
-                self.stdout.write(self.style.SUCCESS(f'Created: {item.name} - {item.sku}'))
-            else:
-                updated_count += 1
-                self.stdout.write(self.style.WARNING(f'Already exists: {item.name} - {item.sku}'))
-            
-            # Create or update stock
-            stock, stock_created = Stock.objects.get_or_create(
-                item=item,
-                defaults={'quantity': stock_quantity, 'low_stock_threshold': 10}
-            )
-            
-            if not stock_created:
-                stock.quantity = stock_quantity
-                stock.save()
+        # Sample data uses 'stock' for the opening quantity
+        rows = [
+            dict(item_data, quantity=item_data.pop('stock'), low_stock_threshold=10)
+            for item_data in sample_items
+        ]
+        report = import_items(rows)
 
         self.stdout.write(self.style.SUCCESS(f'\nSummary:'))
-        self.stdout.write(self.style.SUCCESS(f'Created {created_count} new items'))
-        self.stdout.write(self.style.SUCCESS(f'Found {updated_count} existing items'))
+        self.stdout.write(self.style.SUCCESS(f'Created {report["created"]} new items'))
+        self.stdout.write(self.style.SUCCESS(f'Updated {report["updated"]} existing items'))
+        for error in report['errors']:
+            self.stdout.write(self.style.ERROR(f'Invalid sample item {error["row"]}: {error["errors"]}'))
         self.stdout.write(self.style.SUCCESS(f'Total items in database: {ClothItem.objects.count()}'))
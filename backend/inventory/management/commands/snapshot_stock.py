@@ -0,0 +1,26 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from inventory.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Snapshot every stock level from the ledger (run daily, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--at', help='Day to snapshot, taken at its start (YYYY-MM-DD, default: today)')
+
+    def handle(self, *args, **options):
+        at = None
+        if options['at']:
+            try:
+                day = datetime.strptime(options['at'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f'Invalid date "{options["at"]}", expected YYYY-MM-DD')
+            at = timezone.make_aware(datetime.combine(day, time.min))
+            if at > timezone.now():
+                raise CommandError('Cannot snapshot a time in the future')
+
+        count = take_snapshot(at)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} snapshot rows'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_rename_inventory_c_categor_0f043c_idx_clothitems_categor_7508ab_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(condition=models.Q(('quantity__lte', models.F('low_stock_threshold'))), fields=['item'], name='stockLevels_low_stock_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stock_low_stock_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clothitem',
+            index=models.Index(fields=['created_at', 'id'], name='clothItems_created_id_idx'),
+        ),
+    ]
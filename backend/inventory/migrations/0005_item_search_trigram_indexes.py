@@ -0,0 +1,52 @@
+from django.db import migrations, transaction
+
+
+INDEXES = {
+    'clothItems_name_trgm_idx': 'name',
+    'clothItems_sku_trgm_idx': 'sku',
+    'clothItems_description_trgm_idx': 'description',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    Back the catalogue icontains search with pg_trgm GIN indexes.
+
+    Each index is built on UPPER(column::text), the expression Django emits
+    for icontains on PostgreSQL. Skipped on other databases or when the
+    extension cannot be installed.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except Exception as e:
+        print(f"pg_trgm not available, skipping catalogue search indexes: {str(e)}")
+        return
+
+    for index_name, column in INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "clothItems" '
+            f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def opening_snapshot(apps, schema_editor):
+    """Start the ledger from the current stock levels"""
+    Stock = apps.get_model('inventory', 'Stock')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+
+    now = django.utils.timezone.now()
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(item_id=item_id, taken_at=now, quantity=quantity)
+        for item_id, quantity in Stock.objects.exclude(quantity=0).values_list('item_id', 'quantity')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_item_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('SALE', 'Sale'), ('RESTOCK', 'Restock'), ('ADJUST', 'Adjustment'), ('RETURN', 'Return')], max_length=7)),
+                ('change', models.IntegerField()),
+                ('quantity_after', models.IntegerField()),
+                ('reference', models.CharField(blank=True, max_length=50)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventory.clothitem')),
+            ],
+            options={
+                'db_table': 'stockMovements',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('quantity', models.IntegerField()),
+                ('item', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.clothitem')),
+            ],
+            options={
+                'db_table': 'stockSnapshots',
+                'ordering': ['-taken_at', 'item'],
+                'indexes': [models.Index(fields=['taken_at'], name='stockSnapshots_time_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('item', 'taken_at'), name='stockSnapshots_item_time_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['item', 'created_at'], name='stockMovements_item_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['created_at'], name='stockMovements_time_idx'),
+        ),
+        migrations.RunPython(opening_snapshot, migrations.RunPython.noop),
+    ]
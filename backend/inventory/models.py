@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 
 class ClothCategory(models.TextChoices):
@@ -50,6 +51,8 @@ class ClothItem(models.Model):
         indexes = [
             models.Index(fields=['category', 'size']),
             models.Index(fields=['sku']),
+            # Backs keyset pagination of the item list
+            models.Index(fields=['created_at', 'id'], name='clothItems_created_id_idx'),
         ]
 
     def __str__(self):
@@ -72,6 +75,14 @@ class Stock(models.Model):
 
     class Meta:
         db_table = 'stockLevels'
+        indexes = [
+            # Partial index covering only the rows the low stock report reads
+            models.Index(
+                fields=['item'],
+                name='stockLevels_low_stock_idx',
+                condition=models.Q(quantity__lte=models.F('low_stock_threshold')),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.item.name} - Stock: {self.quantity}"
@@ -83,3 +94,68 @@ class Stock(models.Model):
     @property
     def is_out_of_stock(self):
         return self.quantity == 0
+
+
+class MovementKind(models.TextChoices):
+    SALE = 'SALE', 'Sale'
+    RESTOCK = 'RESTOCK', 'Restock'
+    ADJUSTMENT = 'ADJUST', 'Adjustment'
+    RETURN = 'RETURN', 'Return'
+
+
+class StockMovement(models.Model):
+    """Append-only ledger of every change to a stock level"""
+    # Covered by the (item, created_at) index below
+    item = models.ForeignKey(
+        ClothItem,
+        on_delete=models.CASCADE,
+        related_name='movements',
+        db_index=False
+    )
+    kind = models.CharField(max_length=7, choices=MovementKind.choices)
+    change = models.IntegerField()
+    quantity_after = models.IntegerField()
+    reference = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'stockMovements'
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['item', 'created_at'], name='stockMovements_item_time_idx'),
+            models.Index(fields=['created_at'], name='stockMovements_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.change:+d} - {self.item_id}"
+
+
+class StockSnapshot(models.Model):
+    """
+    Stock levels at a point in time, taken periodically by `snapshot_stock`.
+
+    Items at zero are not stored. Levels at any moment are the latest
+    snapshot before it plus the movements since.
+    """
+    # Covered by the (item, taken_at) unique constraint below
+    item = models.ForeignKey(
+        ClothItem,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        db_index=False
+    )
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        db_table = 'stockSnapshots'
+        ordering = ['-taken_at', 'item']
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'taken_at'], name='stockSnapshots_item_time_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['taken_at'], name='stockSnapshots_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.quantity}"
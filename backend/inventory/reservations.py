@@ -0,0 +1,195 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from .models import MovementKind, Stock
+from .ledger import INBOUND_KINDS, record_movements
+from .catalogue_cache import invalidate
+
+
+class InsufficientStock(Exception):
+    """Raised when a reservation asks for more units than are on hand"""
+
+    def __init__(self, item_id, available, requested):
+        super().__init__(
+            f'Insufficient stock for item {item_id}. '
+            f'Available: {available}, Requested: {requested}'
+        )
+        self.item_id = item_id
+        self.available = available
+        self.requested = requested
+
+
+def reserve_stock(quantities, reference=''):
+    """
+    Atomically take stock for several items.
+
+    Stock rows are locked with SELECT ... FOR UPDATE in ascending item id
+    order, so concurrent reservations touching the same items queue up
+    instead of deadlocking. All levels are checked before anything is
+    written, then every row is decremented with one UPDATE. Items without
+    a Stock row are not tracked and are skipped. The sale is written to
+    the stock ledger with one INSERT.
+
+    Args:
+        quantities: dict of {item_id: quantity to take}
+        reference: recorded on the ledger rows (e.g. the bill number); a
+                   callable is called for it once the levels have been
+                   checked
+
+    Returns:
+        dict: {item_id: new quantity} for every tracked item
+
+    Raises:
+        InsufficientStock: for the first item (by id) that cannot be filled
+    """
+    if not quantities:
+        return {}
+
+    with transaction.atomic():
+        levels = dict(
+            Stock.objects.select_for_update()
+            .filter(item_id__in=quantities)
+            .order_by('item_id')
+            .values_list('item_id', 'quantity')
+        )
+
+        for item_id in sorted(levels):
+            if levels[item_id] < quantities[item_id]:
+                raise InsufficientStock(item_id, levels[item_id], quantities[item_id])
+
+        if callable(reference):
+            reference = reference()
+
+        if levels:
+            Stock.objects.filter(item_id__in=levels).update(
+                quantity=Case(
+                    *[When(item_id=item_id, then=F('quantity') - quantities[item_id])
+                      for item_id in levels],
+                    output_field=IntegerField()
+                )
+            )
+            # update() sends no signals
+            invalidate(levels)
+
+        new_levels = {item_id: levels[item_id] - quantities[item_id] for item_id in levels}
+        record_movements(
+            MovementKind.SALE,
+            {item_id: -quantities[item_id] for item_id in levels},
+            new_levels,
+            reference
+        )
+
+    return new_levels
+
+
+def adjust_stock(item_id, adjustment, kind=None):
+    """
+    Add (or subtract, if negative) units for an item, never going below zero.
+
+    Goes through apply_stock_changes, so the row is locked while the new
+    level is worked out and the change is written to the ledger.
+
+    Returns:
+        Stock: the row after the adjustment
+
+    Raises:
+        Stock.DoesNotExist: if the item has no stock row
+    """
+    with transaction.atomic():
+        kinds = {item_id: kind} if kind else None
+        if not apply_stock_changes({item_id: ('adjustment', adjustment)}, kinds):
+            raise Stock.DoesNotExist
+        return Stock.objects.get(item_id=item_id)
+
+
+def apply_stock_changes(changes, kinds=None):
+    """
+    Apply many stock changes (e.g. a goods-received note) at once.
+
+    Rows are locked in item id order like reserve_stock, the new levels are
+    worked out from the locked values and written back with one UPDATE.
+    Adjustments never take a level below zero. Every change is written to
+    the stock ledger with one INSERT.
+
+    Args:
+        changes: dict of {item_id: ('adjustment' | 'quantity', value)}
+        kinds: optional dict of {item_id: MovementKind} for the ledger;
+               by default stock added by an adjustment is a restock and
+               anything else an adjustment. A restock or return that
+               does not add stock is recorded as an adjustment
+
+    Returns:
+        dict: {item_id: new quantity} for every item that has a stock row;
+              items without one are left out
+    """
+    if not changes:
+        return {}
+
+    with transaction.atomic():
+        levels = dict(
+            Stock.objects.select_for_update()
+            .filter(item_id__in=changes)
+            .order_by('item_id')
+            .values_list('item_id', 'quantity')
+        )
+
+        new_levels = {}
+        for item_id, quantity in levels.items():
+            kind, value = changes[item_id]
+            new_levels[item_id] = value if kind == 'quantity' else max(quantity + value, 0)
+
+        if new_levels:
+            Stock.objects.filter(item_id__in=new_levels).update(
+                quantity=Case(
+                    *[When(item_id=item_id, then=Value(quantity))
+                      for item_id, quantity in new_levels.items()],
+                    output_field=IntegerField()
+                ),
+                last_restocked=timezone.now()
+            )
+            invalidate(new_levels)
+
+        kinds = kinds or {}
+        deltas = {item_id: new_levels[item_id] - levels[item_id] for item_id in new_levels}
+        record_movements(
+            {
+                item_id: _movement_kind(kinds.get(item_id), changes[item_id], deltas[item_id])
+                for item_id in new_levels
+            },
+            deltas,
+            new_levels
+        )
+
+    return new_levels
+
+
+def _movement_kind(kind, change, delta):
+    if kind in INBOUND_KINDS and delta <= 0:
+        return MovementKind.ADJUSTMENT
+    if kind:
+        return kind
+    return MovementKind.RESTOCK if change[0] == 'adjustment' and change[1] > 0 else MovementKind.ADJUSTMENT
+
+
+def set_stock(item_id, quantity, low_stock_threshold=None):
+    """
+    Overwrite the stock level for an item (e.g. after a stock count).
+
+    Returns:
+        Stock: the updated row
+
+    Raises:
+        Stock.DoesNotExist: if the item has no stock row
+    """
+    with transaction.atomic():
+        stock = Stock.objects.select_for_update().get(item_id=item_id)
+        record_movements(
+            MovementKind.ADJUSTMENT,
+            {item_id: quantity - stock.quantity},
+            {item_id: quantity}
+        )
+        stock.quantity = quantity
+        if low_stock_threshold is not None:
+            stock.low_stock_threshold = low_stock_threshold
+        stock.save()
+        return stock
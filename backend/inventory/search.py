@@ -0,0 +1,44 @@
+from django.db.models import Case, IntegerField, Q, Value, When
+
+
+def search_items(queryset, term):
+    """
+    Ranked catalogue search.
+
+    An exact SKU match (unique B-tree index, at most one row) is returned
+    on its own. Anything else is a text search: SKU prefix (B-tree,
+    varchar_pattern_ops on PostgreSQL) or icontains over name/sku/
+    description (pg_trgm GIN indexes where available), ranked so that SKU
+    prefix matches come first, then name matches, then SKU and
+    description matches.
+
+    Returns:
+        QuerySet: matching items in rank order
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+
+    sku = term.upper()
+    exact = queryset.filter(Q(sku=term) | Q(sku=sku))
+    if exact.exists():
+        return exact
+
+    return (
+        queryset.filter(
+            Q(sku__startswith=sku) |
+            Q(name__icontains=term) |
+            Q(sku__icontains=term) |
+            Q(description__icontains=term)
+        )
+        .annotate(rank=Case(
+            When(sku__startswith=sku, then=Value(5)),
+            When(name__iexact=term, then=Value(4)),
+            When(name__istartswith=term, then=Value(3)),
+            When(name__icontains=term, then=Value(2)),
+            When(sku__icontains=term, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        ))
+        .order_by('-rank', 'name', 'id')
+    )
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import ClothItem, Stock
+from clothshop.serializers import SparseFieldsetMixin
+from .models import ClothItem, Stock, StockMovement
+from .ledger import INBOUND_KINDS, MANUAL_KINDS
 
 
 class StockSerializer(serializers.ModelSerializer):
@@ -12,7 +14,16 @@ class StockSerializer(serializers.ModelSerializer):
                   'is_low_stock', 'is_out_of_stock']
 
 
-class ClothItemSerializer(serializers.ModelSerializer):
+class StockSummarySerializer(serializers.ModelSerializer):
+    is_low_stock = serializers.ReadOnlyField()
+    is_out_of_stock = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Stock
+        fields = ['quantity', 'low_stock_threshold', 'is_low_stock', 'is_out_of_stock']
+
+
+class ClothItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     stock = StockSerializer(read_only=True)
     category_display = serializers.CharField(source='get_category_display', read_only=True)
     size_display = serializers.CharField(source='get_size_display', read_only=True)
@@ -23,7 +34,55 @@ class ClothItemSerializer(serializers.ModelSerializer):
                   'color', 'price', 'description', 'sku', 'stock', 'created_at', 'updated_at']
 
 
+class ClothItemListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Compact item representation for list views; ?expand=stock for the full stock object"""
+    stock = StockSummarySerializer(read_only=True)
+    category_display = serializers.CharField(source='get_category_display', read_only=True)
+
+    expandable_fields = {
+        'stock': StockSerializer(read_only=True),
+    }
+
+    class Meta:
+        model = ClothItem
+        fields = ['id', 'name', 'category', 'category_display', 'size',
+                  'color', 'price', 'sku', 'stock']
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'kind', 'kind_display', 'change', 'quantity_after', 'reference', 'created_at']
+
+
 class StockUpdateSerializer(serializers.Serializer):
     item_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=0)
     low_stock_threshold = serializers.IntegerField(min_value=0, required=False)
+
+
+class StockBatchEntrySerializer(serializers.Serializer):
+    """One line of a batch stock update: an item (by id or SKU) and either an adjustment or a new quantity"""
+    item_id = serializers.IntegerField(required=False)
+    sku = serializers.CharField(required=False)
+    adjustment = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+    reason = serializers.ChoiceField(choices=list(MANUAL_KINDS), required=False)
+
+    def validate(self, data):
+        if ('item_id' in data) == ('sku' in data):
+            raise serializers.ValidationError('Give either item_id or sku')
+        if ('adjustment' in data) == ('quantity' in data):
+            raise serializers.ValidationError('Give either adjustment or quantity')
+        if MANUAL_KINDS.get(data.get('reason')) in INBOUND_KINDS and data.get('adjustment', 0) < 0:
+            raise serializers.ValidationError({'adjustment': [f'A {data["reason"]} must add stock']})
+        return data
+
+
+class StockBatchSerializer(serializers.Serializer):
+    MODES = ['atomic', 'best_effort']
+
+    entries = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    mode = serializers.ChoiceField(choices=MODES, default='atomic')
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalogue_cache import invalidate
+from .models import ClothItem, Stock
+
+
+# Saves and deletes through the ORM (the API, the admin, set_stock) drop
+# the cached catalogue entries of the item they touch. Bulk writes call
+# catalogue_cache.invalidate themselves.
+
+
+@receiver([post_save, post_delete], sender=ClothItem, dispatch_uid='catalogue_cache_item')
+def item_changed(sender, instance, **kwargs):
+    invalidate([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Stock, dispatch_uid='catalogue_cache_stock')
+def stock_changed(sender, instance, **kwargs):
+    invalidate([instance.item_id])
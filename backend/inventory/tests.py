@@ -0,0 +1,349 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from clothshop.testing import LOCMEM_CACHES, NO_CACHES, APITestMixin, bill_payload, make_items
+from .imports import import_items, read_rows
+from .models import ClothCategory, ClothItem, MovementKind, Stock, StockMovement
+from .reservations import reserve_stock
+from .search import search_items
+from .views import StockViewSet
+
+
+@override_settings(CACHES=NO_CACHES)
+class CatalogueQueryCountTests(APITestMixin, TestCase):
+    """Catalogue reads run a fixed number of queries however many items there are"""
+
+    def test_item_list(self):
+        make_items(3)
+        queries = self.assertQueriesIndependentOf(
+            lambda: self.client.get('/api/inventory/items/'),
+            lambda: make_items(20)
+        )
+        self.assertEqual(queries, 1)
+
+    def test_item_list_with_stock(self):
+        make_items(3)
+        queries = self.assertQueriesIndependentOf(
+            lambda: self.client.get('/api/inventory/items/?expand=stock&count=true'),
+            lambda: make_items(20)
+        )
+        self.assertEqual(queries, 2)
+
+    def test_low_stock(self):
+        make_items(3, quantity=1)
+        queries = self.assertQueriesIndependentOf(
+            lambda: self.client.get('/api/inventory/items/low_stock/'),
+            lambda: make_items(20, quantity=1)
+        )
+        # count + page
+        self.assertEqual(queries, 2)
+
+    def test_item_detail(self):
+        item = make_items(1)[0]
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/inventory/items/{item.id}/')
+        self.assertEqual(response.data['stock']['quantity'], 100)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogueCacheTests(APITestMixin, TestCase):
+    """Every write path drops the cached entries it makes stale, once it commits"""
+
+    LIST_URL = '/api/inventory/items/?expand=stock'
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.item, self.other = make_items(2, quantity=20)
+
+    def detail_url(self, item):
+        return f'/api/inventory/items/{item.id}/'
+
+    def is_cached(self, url):
+        # A cached read never reaches the database
+        response, queries = self.count_queries(lambda: self.client.get(url))
+        self.assertEqual(response.status_code, 200)
+        return queries == 0
+
+    def assertInvalidates(self, write, stale, fresh=()):
+        """
+        Run write(): the cached list and the details of the `stale` items
+        must be dropped when it commits and not before, the details of the
+        `fresh` items kept.
+        """
+        urls = [self.LIST_URL] + [self.detail_url(item) for item in [*stale, *fresh]]
+        for url in urls:
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = write()
+        self.assertLess(response.status_code, 300)
+        for url in urls:
+            self.assertTrue(self.is_cached(url), url)
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(self.is_cached(self.LIST_URL))
+        for item in stale:
+            self.assertFalse(self.is_cached(self.detail_url(item)))
+        for item in fresh:
+            self.assertTrue(self.is_cached(self.detail_url(item)))
+
+    def test_sale(self):
+        self.assertInvalidates(
+            lambda: self.client.post('/api/billing/bills/', bill_payload([self.item]), format='json'),
+            stale=[self.item], fresh=[self.other]
+        )
+        self.assertEqual(self.client.get(self.detail_url(self.item)).data['stock']['quantity'], 19)
+
+    def test_stock_patch(self):
+        stock = Stock.objects.get(item=self.item)
+        self.assertInvalidates(
+            lambda: self.client.patch(f'/api/inventory/stock/{stock.pk}/', {'quantity': 5}, format='json'),
+            stale=[self.item], fresh=[self.other]
+        )
+
+    def test_batch_update(self):
+        self.assertInvalidates(
+            lambda: self.client.post(
+                '/api/inventory/stock/batch_update/',
+                {'entries': [{'item_id': self.item.id, 'adjustment': 5}]},
+                format='json'
+            ),
+            stale=[self.item], fresh=[self.other]
+        )
+
+    def test_import(self):
+        # An import may touch any item, so every entry goes
+        row = {'sku': self.item.sku, 'name': 'Imported', 'color': 'Red', 'price': '12.00', 'quantity': 3}
+        self.assertInvalidates(
+            lambda: self.client.post('/api/inventory/items/import/', [row], format='json'),
+            stale=[self.item, self.other]
+        )
+
+    def test_item_edit(self):
+        self.assertInvalidates(
+            lambda: self.client.patch(self.detail_url(self.item), {'name': 'Renamed'}, format='json'),
+            stale=[self.item], fresh=[self.other]
+        )
+        self.assertEqual(self.client.get(self.detail_url(self.item)).data['name'], 'Renamed')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        for sku, name in [
+            ('TSH-001', 'Cotton T-Shirt'),
+            ('SHT-001', 'Formal Dress Shirt'),
+            ('JNS-001', 'Slim Jeans'),
+        ]:
+            ClothItem.objects.create(sku=sku, name=name, color='Blue', price='10.00')
+
+    def search(self, term):
+        return list(search_items(ClothItem.objects.all(), term).values_list('sku', flat=True))
+
+    def test_exact_sku(self):
+        self.assertEqual(self.search('tsh-001'), ['TSH-001'])
+
+    def test_sku_prefix_does_not_hide_text_matches(self):
+        # SKU prefix matches rank first, name matches still follow
+        self.assertEqual(self.search('sh'), ['SHT-001', 'TSH-001'])
+        self.assertEqual(self.search('t'), ['TSH-001', 'SHT-001'])
+
+    def test_name_match(self):
+        self.assertEqual(self.search('jeans'), ['JNS-001'])
+
+
+class PopulateItemsTests(TestCase):
+    def test_seeds_full_catalogue(self):
+        out = StringIO()
+        call_command('populate_items', stdout=out)
+
+        self.assertEqual(ClothItem.objects.count(), 22)
+        self.assertEqual(Stock.objects.count(), 22)
+        self.assertNotIn('Invalid sample item', out.getvalue())
+
+
+@override_settings(CACHES=NO_CACHES)
+class ImportItemsTests(TestCase):
+    """Catalogue and stock upserts by SKU"""
+
+    def setUp(self):
+        self.item = make_items(1, quantity=100)[0]
+        ClothItem.objects.filter(pk=self.item.pk).update(description='Keep me', category=ClothCategory.JEANS)
+
+    def row(self, sku=None, **fields):
+        return dict({'sku': sku or self.item.sku, 'name': 'Imported', 'color': 'Red', 'price': '12.00'}, **fields)
+
+    def test_upsert_by_sku(self):
+        report = import_items([self.row(price='15.99'), self.row('NEW-001', quantity=7)])
+
+        self.assertEqual((report['created'], report['updated'], report['invalid']), (1, 1, 0))
+        item = ClothItem.objects.get(sku=self.item.sku)
+        self.assertEqual((item.pk, item.name, str(item.price)), (self.item.pk, 'Imported', '15.99'))
+        self.assertEqual(Stock.objects.get(item__sku='NEW-001').quantity, 7)
+        self.assertEqual(ClothItem.objects.count(), 2)
+
+    def test_missing_columns_keep_current_values(self):
+        csv_file = StringIO(f'sku,name,color,price,category,quantity\n{self.item.sku},Imported,Red,12.00,,\n')
+        import_items(read_rows(csv_file, 'csv'))
+
+        item = ClothItem.objects.select_related('stock').get(pk=self.item.pk)
+        self.assertEqual(item.name, 'Imported')
+        self.assertEqual((item.description, item.category), ('Keep me', ClothCategory.JEANS))
+        self.assertEqual((item.stock.quantity, item.stock.low_stock_threshold), (100, 10))
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        report = import_items([
+            self.row('OK-001'),
+            self.row('BAD-001', name=''),
+            self.row('BAD-002', price='abc'),
+            self.row('BAD-003', category='HAT'),
+            'not an object',
+        ])
+
+        self.assertEqual((report['created'], report['invalid']), (1, 4))
+        self.assertEqual(
+            [(error['row'], sorted(error['errors'])) for error in report['errors']],
+            [(2, ['name']), (3, ['price']), (4, ['category']), (5, ['non_field_errors'])]
+        )
+        self.assertFalse(ClothItem.objects.filter(sku__startswith='BAD').exists())
+
+    def test_dry_run_writes_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            report = import_items([self.row(quantity=1), self.row('NEW-001', quantity=7)], dry_run=True)
+
+        self.assertEqual((report['created'], report['updated']), (1, 1))
+        self.assertEqual(ClothItem.objects.get().name, self.item.name)
+        self.assertEqual(Stock.objects.get().quantity, 100)
+        self.assertFalse(StockMovement.objects.exists())
+        # Nor does it drop the catalogue cache
+        self.assertEqual(callbacks, [])
+
+    def test_changed_quantities_are_on_the_ledger(self):
+        unchanged = make_items(1, quantity=5, prefix='UNC')[0]
+        import_items([
+            self.row(quantity=40),
+            self.row(unchanged.sku, quantity=5),
+            self.row('NEW-001', quantity=7),
+            self.row('NEW-002'),
+        ])
+
+        movements = {
+            movement.item.sku: (movement.kind, movement.change, movement.quantity_after, movement.reference)
+            for movement in StockMovement.objects.select_related('item')
+        }
+        self.assertEqual(movements, {
+            self.item.sku: (MovementKind.ADJUSTMENT, -60, 40, 'import'),
+            'NEW-001': (MovementKind.RESTOCK, 7, 7, 'import'),
+        })
+
+
+@override_settings(CACHES=NO_CACHES)
+class StockLedgerTests(APITestMixin, TestCase):
+    """Every way of changing stock leaves a ledger that adds up to the level"""
+
+    def setUp(self):
+        super().setUp()
+        self.item = make_items(1, quantity=0)[0]
+        self.client.post('/api/inventory/stock/update_stock/', {'item_id': self.item.id, 'quantity': 10}, format='json')
+
+    def assertLedgerMatchesStock(self):
+        movements = StockMovement.objects.filter(item=self.item).order_by('id')
+        quantity = Stock.objects.get(item=self.item).quantity
+        self.assertEqual(sum(movement.change for movement in movements), quantity)
+        self.assertEqual(movements.last().quantity_after, quantity)
+
+    def test_return_must_add_stock(self):
+        response = self.client.post(
+            '/api/inventory/stock/adjust_stock/',
+            {'item_id': self.item.id, 'adjustment': -2, 'reason': 'return'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            '/api/inventory/stock/batch_update/',
+            {'entries': [{'item_id': self.item.id, 'adjustment': -2, 'reason': 'restock'}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Stock.objects.get(item=self.item).quantity, 10)
+
+    def test_return_that_lowers_stock_is_an_adjustment(self):
+        # A quantity can only be checked against the level once the row is locked
+        response = self.client.post(
+            '/api/inventory/stock/batch_update/',
+            {'entries': [{'item_id': self.item.id, 'quantity': 4, 'reason': 'return'}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        last = StockMovement.objects.filter(item=self.item).latest('id')
+        self.assertEqual((last.kind, last.change), (MovementKind.ADJUSTMENT, -6))
+        self.assertLedgerMatchesStock()
+
+    def patch_after_sale(self, data):
+        """PATCH the stock row with a sale of 3 committing after the view has read it"""
+        stock = Stock.objects.get(item=self.item)
+        get_object = StockViewSet.get_object
+
+        def get_object_then_sell(view):
+            instance = get_object(view)
+            reserve_stock({self.item.id: 3}, 'BILL-1')
+            return instance
+
+        with mock.patch.object(StockViewSet, 'get_object', get_object_then_sell):
+            return self.client.patch(f'/api/inventory/stock/{stock.pk}/', data, format='json')
+
+    def test_patch_threshold_keeps_concurrent_sale(self):
+        response = self.patch_after_sale({'low_stock_threshold': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['quantity'], response.data['low_stock_threshold']), (7, 2))
+        stock = Stock.objects.get(item=self.item)
+        self.assertEqual((stock.quantity, stock.low_stock_threshold), (7, 2))
+        # Only the sale is on the ledger since the stock count in setUp
+        last = StockMovement.objects.filter(item=self.item).latest('id')
+        self.assertEqual((last.kind, last.change), (MovementKind.SALE, -3))
+        self.assertLedgerMatchesStock()
+
+    def test_patch_quantity_records_change_from_locked_level(self):
+        response = self.patch_after_sale({'quantity': 5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Stock.objects.get(item=self.item).quantity, 5)
+        last = StockMovement.objects.filter(item=self.item).latest('id')
+        self.assertEqual((last.kind, last.change), (MovementKind.ADJUSTMENT, -2))
+        self.assertLedgerMatchesStock()
+
+    def test_admin_stock_edit_is_recorded(self):
+        stock = Stock.objects.get(item=self.item)
+        admin = User.objects.create_superuser('admin', password='secret')
+        self.client.force_login(admin)
+        response = self.client.post(f'/admin/inventory/stock/{stock.pk}/change/', {
+            'item': self.item.id, 'quantity': 3, 'low_stock_threshold': 10,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Stock.objects.get(item=self.item).quantity, 3)
+        self.assertLedgerMatchesStock()
+
+    def test_admin_ledger_is_read_only(self):
+        movement = StockMovement.objects.filter(item=self.item).first()
+        admin = User.objects.create_superuser('admin', password='secret')
+        self.client.force_login(admin)
+
+        self.assertEqual(self.client.get(f'/admin/inventory/stockmovement/{movement.pk}/change/').status_code, 200)
+        self.assertEqual(self.client.get('/admin/inventory/stockmovement/add/').status_code, 403)
+        self.client.post(f'/admin/inventory/stockmovement/{movement.pk}/change/', {'change': 99})
+        self.assertEqual(self.client.post(f'/admin/inventory/stockmovement/{movement.pk}/delete/', {'post': 'yes'}).status_code, 403)
+        movement.refresh_from_db()
+        self.assertEqual(movement.change, 10)
+
+        # Deleting the item still takes its ledger with it
+        response = self.client.post(f'/admin/inventory/clothitem/{self.item.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(StockMovement.objects.filter(item_id=self.item.pk).exists())
@@ -2,18 +2,33 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
+from rest_framework.pagination import PageNumberPagination
+from clothshop.pagination import KeysetPagination
+from datetime import datetime, time, timedelta
+from functools import partial
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import F
 from .models import ClothItem, Stock
-from .serializers import ClothItemSerializer, StockSerializer, StockUpdateSerializer
+from .serializers import (
+    ClothItemListSerializer, ClothItemSerializer, StockBatchEntrySerializer,
+    StockBatchSerializer, StockMovementSerializer, StockSerializer, StockUpdateSerializer
+)
+from .reservations import adjust_stock, apply_stock_changes, set_stock
+from .ledger import INBOUND_KINDS, MANUAL_KINDS, movement_report, stock_as_of
+from .imports import ImportFormatError, import_items, read_rows
+from .search import search_items
+from . import catalogue_cache
 
 
 class ClothItemViewSet(viewsets.ModelViewSet):
     queryset = ClothItem.objects.all()
     serializer_class = ClothItemSerializer
     permission_classes = [IsAuthenticated]  # Require authentication for all actions
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        queryset = ClothItem.objects.all()
+        queryset = ClothItem.objects.select_related('stock')
         
         # Filter by category
         category = self.request.query_params.get('category', None)
@@ -25,32 +40,105 @@ class ClothItemViewSet(viewsets.ModelViewSet):
         if size:
             queryset = queryset.filter(size=size)
         
-        # Search by name or SKU
+        # Search by SKU, name or description (ranked)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(sku__icontains=search) |
-                Q(description__icontains=search)
-            )
+            queryset = search_items(queryset, search)
         
         return queryset
 
+    @property
+    def paginator(self):
+        # Ranked search results keep their rank order, so they are paged by
+        # number; everything else uses keyset pagination
+        if (not hasattr(self, '_paginator') and self.request is not None
+                and self.request.query_params.get('search')):
+            self._paginator = PageNumberPagination()
+        return super().paginator
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'low_stock'):
+            return ClothItemListSerializer
+        return ClothItemSerializer
+
+    def list(self, request, *args, **kwargs):
+        # Read through the catalogue cache; changes to items and stock drop
+        # the cached pages
+        build = partial(super().list, request, *args, **kwargs)
+        return Response(catalogue_cache.get_list(request, lambda: build().data))
+
+    def retrieve(self, request, *args, **kwargs):
+        build = partial(super().retrieve, request, *args, **kwargs)
+        try:
+            item_id = int(kwargs['pk'])
+        except ValueError:
+            return build()
+        return Response(catalogue_cache.get_item(item_id, request, lambda: build().data))
+
     def perform_create(self, serializer):
         item = serializer.save()
         # Create stock entry for new item
         Stock.objects.create(item=item, quantity=0)
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Upsert items and stock levels by SKU from an uploaded file or a JSON body.
+        
+        Upload a csv/json/ndjson `file` (format taken from the extension or
+        ?import_format=), or post a JSON array of items. ?dry_run=true only
+        validates. Invalid rows are skipped and reported by row number.
+        """
+        upload = request.FILES.get('file')
+        if upload is not None:
+            import_format = request.query_params.get(
+                'import_format', upload.name.rsplit('.', 1)[-1].lower()
+            )
+            rows = read_rows(upload, import_format)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response(
+                {'error': 'Upload a file or post a JSON array of items'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true')
+        try:
+            report = import_items(rows, dry_run=dry_run)
+        except ImportFormatError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(report)
+
+    def get_low_stock_queryset(self):
+        return (
+            ClothItem.objects.select_related('stock')
+            .filter(stock__quantity__lte=F('stock__low_stock_threshold'))
+            .annotate(shortfall=F('stock__low_stock_threshold') - F('stock__quantity'))
+            .order_by('-shortfall', 'id')
+        )
+
+    @action(detail=False, methods=['get'], pagination_class=PageNumberPagination)
     def low_stock(self, request):
-        """Get items with low stock"""
-        low_stock_items = []
-        for item in ClothItem.objects.all():
-            if hasattr(item, 'stock') and item.stock.is_low_stock:
-                low_stock_items.append(item)
+        """Get items with low stock, most urgent (largest shortfall) first"""
+        return Response(catalogue_cache.get_list(request, self._low_stock_data))
+
+    def _low_stock_data(self):
+        queryset = self.get_low_stock_queryset()
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data).data
         
-        serializer = self.get_serializer(low_stock_items, many=True)
-        return Response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return serializer.data
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Catalogue cache hits and misses of the worker that serves this request"""
+        return Response(catalogue_cache.stats())
 
 
 class StockViewSet(viewsets.ModelViewSet):
@@ -58,6 +146,22 @@ class StockViewSet(viewsets.ModelViewSet):
     serializer_class = StockSerializer
     permission_classes = [IsAuthenticated]  # Require authentication for all actions
 
+    def perform_update(self, serializer):
+        # Write to the row as it is once locked, not the copy read before:
+        # saving that copy would undo sales committed in between. Quantity
+        # goes through set_stock, so the ledger records the change made
+        fields = dict(serializer.validated_data)
+        with transaction.atomic():
+            if 'quantity' in fields:
+                stock = set_stock(serializer.instance.item_id, fields.pop('quantity'))
+            else:
+                stock = Stock.objects.select_for_update().get(pk=serializer.instance.pk)
+            for field, value in fields.items():
+                setattr(stock, field, value)
+            if fields:
+                stock.save(update_fields=list(fields))
+        serializer.instance = stock
+
     @action(detail=False, methods=['post'])
     def update_stock(self, request):
         """Update stock quantity for an item"""
@@ -67,13 +171,11 @@ class StockViewSet(viewsets.ModelViewSet):
             quantity = serializer.validated_data['quantity']
             
             try:
-                stock = Stock.objects.get(item_id=item_id)
-                stock.quantity = quantity
-                
-                if 'low_stock_threshold' in serializer.validated_data:
-                    stock.low_stock_threshold = serializer.validated_data['low_stock_threshold']
-                
-                stock.save()
+                stock = set_stock(
+                    item_id,
+                    quantity,
+                    serializer.validated_data.get('low_stock_threshold')
+                )
                 return Response(StockSerializer(stock).data)
             except Stock.DoesNotExist:
                 return Response(
@@ -85,18 +187,161 @@ class StockViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def adjust_stock(self, request):
-        """Adjust stock by adding or subtracting quantity"""
-        item_id = request.data.get('item_id')
-        adjustment = request.data.get('adjustment', 0)
+        """Adjust stock by adding or subtracting quantity (optional reason: restock, adjustment, return)"""
+        try:
+            adjustment = int(request.data.get('adjustment', 0))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Adjustment must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        reason = request.data.get('reason')
+        if reason is not None and reason not in MANUAL_KINDS:
+            return Response(
+                {'error': f'Reason must be one of: {", ".join(MANUAL_KINDS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if MANUAL_KINDS.get(reason) in INBOUND_KINDS and adjustment < 0:
+            return Response(
+                {'error': f'A {reason} must add stock'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            item_id = int(request.data.get('item_id'))
+        except (TypeError, ValueError):
+            item_id = None
         
         try:
-            stock = Stock.objects.get(item_id=item_id)
-            new_quantity = max(0, stock.quantity + adjustment)
-            stock.quantity = new_quantity
-            stock.save()
+            if item_id is None:
+                raise Stock.DoesNotExist
+            stock = adjust_stock(item_id, adjustment, MANUAL_KINDS.get(reason))
             return Response(StockSerializer(stock).data)
         except Stock.DoesNotExist:
             return Response(
                 {'error': 'Stock not found for this item'},
                 status=status.HTTP_404_NOT_FOUND
             )
+
+    @action(detail=False, methods=['post'])
+    def batch_update(self, request):
+        """
+        Apply many stock changes (e.g. a goods-received note) in one transaction.
+        
+        Body: {"entries": [{"item_id" or "sku", "adjustment" or "quantity", "reason"?}, ...],
+               "mode": "atomic" | "best_effort"}
+        In atomic mode (the default) nothing is applied if any entry is
+        invalid; best_effort applies the valid entries and reports the rest.
+        """
+        serializer = StockBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        best_effort = serializer.validated_data['mode'] == 'best_effort'
+        
+        errors = {}
+        entries = {}
+        for index, entry in enumerate(serializer.validated_data['entries']):
+            entry_serializer = StockBatchEntrySerializer(data=entry)
+            if entry_serializer.is_valid():
+                entries[index] = entry_serializer.validated_data
+            else:
+                errors[index] = entry_serializer.errors
+        
+        # Resolve SKUs with one query
+        skus = {entry['sku'] for entry in entries.values() if 'sku' in entry}
+        item_ids = dict(ClothItem.objects.filter(sku__in=skus).values_list('sku', 'id')) if skus else {}
+        
+        changes = {}
+        reasons = {}
+        entry_items = {}
+        for index, entry in entries.items():
+            item_id = entry['item_id'] if 'item_id' in entry else item_ids.get(entry['sku'])
+            if item_id is None:
+                errors[index] = {'sku': ['Unknown SKU']}
+            elif item_id in changes:
+                errors[index] = {'non_field_errors': ['Item appears more than once']}
+            else:
+                kind = 'adjustment' if 'adjustment' in entry else 'quantity'
+                changes[item_id] = (kind, entry[kind])
+                if 'reason' in entry:
+                    reasons[item_id] = MANUAL_KINDS[entry['reason']]
+                entry_items[index] = item_id
+        
+        if errors and not best_effort:
+            return self._batch_errors(errors)
+        
+        with transaction.atomic():
+            levels = apply_stock_changes(changes, reasons)
+            for index, item_id in entry_items.items():
+                if item_id not in levels:
+                    errors[index] = {'item_id': ['Stock not found for this item']}
+            
+            if errors and not best_effort:
+                transaction.set_rollback(True)
+                return self._batch_errors(errors)
+        
+        return Response({
+            'results': [
+                {'index': index, 'item_id': item_id, 'quantity': levels[item_id]}
+                for index, item_id in entry_items.items() if item_id in levels
+            ],
+            'errors': self._error_list(errors),
+        })
+
+    @action(detail=False, methods=['get'])
+    def movements(self, request):
+        """
+        Stock ledger for one item (?item_id=) between date_from and date_to
+        (inclusive, default: the last 30 days), with opening and closing levels.
+        """
+        try:
+            item_id = int(request.query_params.get('item_id'))
+        except (TypeError, ValueError):
+            return Response({'error': 'item_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        today = timezone.localdate()
+        try:
+            date_from = self._query_date('date_from', today - timedelta(days=29))
+            date_to = self._query_date('date_to', today)
+        except ValueError:
+            return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        report = movement_report(item_id, self._day_start(date_from), self._day_start(date_to + timedelta(days=1)))
+        report['movements'] = StockMovementSerializer(report['movements'], many=True).data
+        return Response({
+            'item_id': item_id,
+            'date_from': date_from,
+            'date_to': date_to,
+            **report,
+        })
+
+    @action(detail=False, methods=['get'])
+    def as_of(self, request):
+        """Stock level of every item at the end of ?date= (YYYY-MM-DD)"""
+        try:
+            day = self._query_date('date', timezone.localdate())
+        except ValueError:
+            return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        levels = stock_as_of(self._day_start(day + timedelta(days=1)))
+        return Response({
+            'date': day,
+            'levels': [
+                {'item_id': item_id, 'sku': sku, 'quantity': levels.get(item_id, 0)}
+                for item_id, sku in ClothItem.objects.order_by('id').values_list('id', 'sku')
+            ],
+        })
+
+    def _query_date(self, name, default):
+        value = self.request.query_params.get(name)
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else default
+
+    def _day_start(self, day):
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def _error_list(self, errors):
+        return [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
+
+    def _batch_errors(self, errors):
+        return Response({'errors': self._error_list(errors)}, status=status.HTTP_400_BAD_REQUEST)
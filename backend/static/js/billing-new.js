@@ -1,6 +1,38 @@
 // Billing functionality
 let availableItems = [];
 let cart = [];
+// Retries of the same bill reuse its Idempotency-Key, so the server creates it only once
+let pendingBill = null;
+
+function billIdempotencyKey(body) {
+    if (!pendingBill || pendingBill.body !== body) {
+        const key = (window.crypto && crypto.randomUUID)
+            ? crypto.randomUUID()
+            : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        pendingBill = { body, key };
+    }
+    return pendingBill.key;
+}
+
+// POST the bill, retrying a few times if the network drops the request
+async function postBill(billData) {
+    const body = JSON.stringify(billData);
+    const headers = { 'Idempotency-Key': billIdempotencyKey(body) };
+    
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const bill = await apiRequest(API_ENDPOINTS.bills, { method: 'POST', body, headers });
+            pendingBill = null;
+            return bill;
+        } catch (error) {
+            // fetch() rejects with a TypeError when the request never got a response
+            if (!(error instanceof TypeError) || attempt >= 3) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+        }
+    }
+}
 
 // Load available items
 async function loadAvailableItems() {
@@ -13,6 +45,8 @@ async function loadAvailableItems() {
         console.log('API Response:', data);
         availableItems = data.results || data;
         console.log('Loaded items:', availableItems.length);
+        // Keep a copy so the counter can keep billing while offline
+        localStorage.setItem('offline_catalogue', JSON.stringify(availableItems));
         
         if (availableItems.length === 0) {
             container.innerHTML = '<div style="padding: 1rem; text-align: center; color: var(--gray);">No items found in inventory</div>';
@@ -24,6 +58,15 @@ async function loadAvailableItems() {
         }
     } catch (error) {
         console.error('Error loading items:', error);
+        
+        const cached = localStorage.getItem('offline_catalogue');
+        if (error instanceof TypeError && cached) {
+            availableItems = JSON.parse(cached);
+            displaySearchResults(availableItems);
+            showNotification('Offline: showing the last loaded items', 'error');
+            return;
+        }
+        
         container.innerHTML = '<div style="padding: 1rem; text-align: center; color: #f5576c;"><i class="fas fa-exclamation-triangle"></i> Failed to load items. Please login and try again.</div>';
         showNotification('Failed to load items. Please login first.', 'error');
         availableItems = [];
@@ -211,6 +254,16 @@ function updateTotals() {
     document.getElementById('total').textContent = formatCurrency(total);
 }
 
+// Clear the cart and customer details for the next bill
+function resetBillForm() {
+    cart = [];
+    ['customerName', 'customerPhone', 'customerEmail', 'notes'].forEach(id => {
+        document.getElementById(id).value = '';
+    });
+    displayCart();
+    updateTotals();
+}
+
 // Create bill
 async function createBill() {
     if (cart.length === 0) {
@@ -251,10 +304,7 @@ async function createBill() {
         }
         
         console.log('Creating bill with data:', billData);
-        const bill = await apiRequest(API_ENDPOINTS.bills, {
-            method: 'POST',
-            body: JSON.stringify(billData)
-        });
+        const bill = await postBill(billData);
         
         console.log('Bill created:', bill);
         updateLoader('Generating PDF...');
@@ -292,6 +342,16 @@ async function createBill() {
     } catch (error) {
         console.error('Error creating bill:', error);
         hideLoader();
+        
+        // No connection: keep the bill on this terminal and upload it later
+        if (error instanceof TypeError && pendingBill && typeof OfflineBills !== 'undefined') {
+            OfflineBills.enqueue(billData, pendingBill.key);
+            pendingBill = null;
+            resetBillForm();
+            showNotification('Offline: bill saved and will be uploaded when the connection is back', 'success');
+            return;
+        }
+        
         showNotification('Failed to create bill', 'error');
     }
 }
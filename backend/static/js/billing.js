@@ -1,6 +1,38 @@
 // Billing functionality
 let availableItems = [];
 let cart = [];
+// Retries of the same bill reuse its Idempotency-Key, so the server creates it only once
+let pendingBill = null;
+
+function billIdempotencyKey(body) {
+    if (!pendingBill || pendingBill.body !== body) {
+        const key = (window.crypto && crypto.randomUUID)
+            ? crypto.randomUUID()
+            : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        pendingBill = { body, key };
+    }
+    return pendingBill.key;
+}
+
+// POST the bill, retrying a few times if the network drops the request
+async function postBill(billData) {
+    const body = JSON.stringify(billData);
+    const headers = { 'Idempotency-Key': billIdempotencyKey(body) };
+    
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const bill = await apiRequest(API_ENDPOINTS.bills, { method: 'POST', body, headers });
+            pendingBill = null;
+            return bill;
+        } catch (error) {
+            // fetch() rejects with a TypeError when the request never got a response
+            if (!(error instanceof TypeError) || attempt >= 3) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+        }
+    }
+}
 
 // Load available items
 async function loadAvailableItems() {
@@ -247,10 +279,7 @@ async function createBill() {
         }
         
         console.log('Creating bill with data:', billData);
-        const bill = await apiRequest(API_ENDPOINTS.bills, {
-            method: 'POST',
-            body: JSON.stringify(billData)
-        });
+        const bill = await postBill(billData);
         
         console.log('Bill created:', bill);
         showNotification('Bill created successfully! Redirecting to dashboard...', 'success');
@@ -8,6 +8,8 @@ const API_ENDPOINTS = {
     lowStock: `${API_BASE_URL}/inventory/items/low_stock/`,
     updateStock: `${API_BASE_URL}/inventory/stock/update_stock/`,
     bills: `${API_BASE_URL}/billing/bills/`,
+    billSync: `${API_BASE_URL}/billing/bills/sync/`,
+    summary: `${API_BASE_URL}/billing/summary/`,
     authLogin: `${API_BASE_URL}/auth/login/`,
     authLogout: `${API_BASE_URL}/auth/logout/`,
     authWhoami: `${API_BASE_URL}/auth/whoami/`,
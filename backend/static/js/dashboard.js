@@ -1,16 +1,16 @@
 // Dashboard functionality
-let items = [];
+let summary = {};
 let bills = [];
 let lowStockItems = [];
 
 // Load dashboard data
 async function loadDashboard() {
     try {
-        // Load items
-        items = await apiRequest(API_ENDPOINTS.items);
+        // Load shop-wide totals (computed on the server)
+        summary = await apiRequest(API_ENDPOINTS.summary);
         
-        // Load bills
-        bills = await apiRequest(API_ENDPOINTS.bills);
+        // Load recent bills (only the columns the table shows)
+        bills = await apiRequest(`${API_ENDPOINTS.bills}?fields=id,bill_number,customer_name,created_at,final_amount`);
         
         // Load low stock items
         lowStockItems = await apiRequest(API_ENDPOINTS.lowStock);
@@ -25,19 +25,10 @@ async function loadDashboard() {
 
 // Update statistics
 function updateStats() {
-    const totalItems = items.results ? items.results.length : items.length;
-    const totalStock = items.results 
-        ? items.results.reduce((sum, item) => sum + (item.stock?.quantity || 0), 0)
-        : items.reduce((sum, item) => sum + (item.stock?.quantity || 0), 0);
-    const totalBills = bills.results ? bills.results.length : bills.length;
-    const totalRevenue = bills.results
-        ? bills.results.reduce((sum, bill) => sum + parseFloat(bill.final_amount || 0), 0)
-        : bills.reduce((sum, bill) => sum + parseFloat(bill.final_amount || 0), 0);
-
-    document.getElementById('totalItems').textContent = totalItems;
-    document.getElementById('totalStock').textContent = totalStock;
-    document.getElementById('totalBills').textContent = totalBills;
-    document.getElementById('totalRevenue').textContent = formatCurrency(totalRevenue);
+    document.getElementById('totalItems').textContent = summary.item_count || 0;
+    document.getElementById('totalStock').textContent = summary.total_stock || 0;
+    document.getElementById('totalBills').textContent = summary.bill_count || 0;
+    document.getElementById('totalRevenue').textContent = formatCurrency(summary.revenue);
 }
 
 // Display low stock items
@@ -0,0 +1,115 @@
+// Offline bill queue for counter terminals
+// Bills that cannot reach the server are kept in localStorage and uploaded
+// in batches to /billing/bills/sync/ once the connection is back.
+const OfflineBills = {
+    storageKey: 'offline_bills',
+    rejectedKey: 'offline_bills_rejected',
+    batchSize: 50,
+    syncIntervalMs: 60000,
+    syncing: false,
+
+    all() {
+        try {
+            return JSON.parse(localStorage.getItem(this.storageKey) || '[]');
+        } catch (error) {
+            return [];
+        }
+    },
+
+    save(bills) {
+        localStorage.setItem(this.storageKey, JSON.stringify(bills));
+        this.updateStatus();
+    },
+
+    // clientId doubles as the bill's Idempotency-Key, so a bill whose first
+    // upload did reach the server is not created twice
+    enqueue(billData, clientId) {
+        const bills = this.all();
+        bills.push({ ...billData, client_id: clientId, queued_at: new Date().toISOString() });
+        this.save(bills);
+    },
+
+    // Bills the server refused (e.g. not enough stock), kept for the operator to review
+    rejected() {
+        try {
+            return JSON.parse(localStorage.getItem(this.rejectedKey) || '[]');
+        } catch (error) {
+            return [];
+        }
+    },
+
+    async sync() {
+        if (this.syncing || !navigator.onLine || this.all().length === 0) {
+            return;
+        }
+        this.syncing = true;
+        this.updateStatus();
+
+        let created = 0;
+        let refused = 0;
+        try {
+            while (this.all().length > 0) {
+                const batch = this.all().slice(0, this.batchSize);
+                const response = await apiRequest(API_ENDPOINTS.billSync, {
+                    method: 'POST',
+                    body: JSON.stringify({ bills: batch })
+                });
+
+                // Failed bills (server errors) stay queued for the next attempt
+                const answered = new Map();
+                response.results.forEach((result, index) => {
+                    if (result.status !== 'failed') {
+                        answered.set(batch[index].client_id, result);
+                    }
+                });
+                if (answered.size === 0) {
+                    break;
+                }
+
+                const refusedBills = batch
+                    .filter(bill => answered.has(bill.client_id) && answered.get(bill.client_id).status !== 'created')
+                    .map(bill => ({ ...bill, error: answered.get(bill.client_id).error }));
+                if (refusedBills.length > 0) {
+                    localStorage.setItem(this.rejectedKey, JSON.stringify([...this.rejected(), ...refusedBills]));
+                }
+
+                created += answered.size - refusedBills.length;
+                refused += refusedBills.length;
+                this.save(this.all().filter(bill => !answered.has(bill.client_id)));
+            }
+        } catch (error) {
+            console.error('Offline bill sync failed:', error);
+        } finally {
+            this.syncing = false;
+            this.updateStatus();
+        }
+
+        if (created > 0) {
+            showNotification(`${created} offline bill(s) uploaded`, 'success');
+        }
+        if (refused > 0) {
+            showNotification(`${refused} offline bill(s) were refused (e.g. out of stock)`, 'error');
+        }
+    },
+
+    updateStatus() {
+        const badge = document.getElementById('offlineBillsStatus');
+        if (!badge) {
+            return;
+        }
+        const count = this.all().length;
+        badge.style.display = count > 0 ? '' : 'none';
+        badge.textContent = this.syncing
+            ? `Uploading ${count} offline bill(s)...`
+            : `${count} bill(s) waiting to upload`;
+    },
+
+    init() {
+        window.addEventListener('online', () => this.sync());
+        setInterval(() => this.sync(), this.syncIntervalMs);
+        this.updateStatus();
+        this.sync();
+    }
+};
+
+document.addEventListener('DOMContentLoaded', () => OfflineBills.init());
@@ -42,7 +42,7 @@ function displayBills() {
             <td>${bill.customer_name}</td>
             <td>${bill.customer_phone || 'N/A'}</td>
             <td>${formatDate(bill.created_at)}</td>
-            <td>${bill.items?.length || 0}</td>
+            <td>${bill.item_count ?? bill.items?.length ?? 0}</td>
             <td>${formatCurrency(bill.final_amount)}</td>
             <td>
                 <button class="btn btn-sm btn-primary" onclick="viewBillDetails(${bill.id})" title="View Details">